@@ -0,0 +1,126 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+class _Entry:
+    __slots__ = ("answer", "embedding", "created", "nbytes")
+
+    def __init__(self, answer: str, embedding: Optional[np.ndarray]):
+        self.answer = answer
+        self.embedding = embedding
+        self.created = time.monotonic()
+        self.nbytes = len(answer.encode("utf-8")) + (embedding.nbytes if embedding is not None else 0)
+
+
+class AnswerCache:
+    """
+    LRU/TTL cache of finished answers, bounded by entry count and bytes.
+
+    Entries are keyed by (normalized question, hash of the retrieved chunk IDs) and
+    belong to one index version; seeing a new version drops everything. With a
+    similarity threshold set, a miss on the exact question falls back to the most
+    similar cached question over the same retrieved chunks (cosine on the query
+    embeddings).
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float,
+                 similarity_threshold: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.version: Optional[str] = None
+        self.nbytes = 0
+        self.stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "evictions": 0}
+        self._entries: "OrderedDict[tuple[str, str], _Entry]" = OrderedDict()
+        self._by_context: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, query: str, context_hash: str, version: str,
+            embedding: Optional[list[float]] = None) -> Optional[str]:
+        self._check_version(version)
+        key = (query, context_hash)
+        entry = self._entries.get(key)
+        if entry and self._expired(entry):
+            self._remove(key)
+            entry = None
+        if entry:
+            self._entries.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            return entry.answer
+
+        if self.similarity_threshold is not None and embedding is not None:
+            similar = self._most_similar(context_hash, _unit(embedding))
+            if similar:
+                self._entries.move_to_end(similar)
+                self.stats["similar_hits"] += 1
+                logging.info(f"♻️ Answer cache: '{query}' matched '{similar[0]}'")
+                return self._entries[similar].answer
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, query: str, context_hash: str, version: str, answer: str,
+            embedding: Optional[list[float]] = None):
+        self._check_version(version)
+        key = (query, context_hash)
+        if key in self._entries:
+            self._remove(key)
+        entry = _Entry(answer, _unit(embedding) if embedding is not None else None)
+        if entry.nbytes > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._by_context.setdefault(context_hash, set()).add(query)
+        self.nbytes += entry.nbytes
+        while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._by_context.clear()
+        self.nbytes = 0
+
+    def _check_version(self, version: str):
+        if version != self.version:
+            if self._entries:
+                logging.info(f"🧹 Index version changed ({self.version} -> {version}), "
+                             f"dropping {len(self._entries)} cached answers")
+            self.clear()
+            self.version = version
+
+    def _most_similar(self, context_hash: str, embedding: np.ndarray) -> Optional[tuple[str, str]]:
+        best, best_score = None, self.similarity_threshold
+        for query in self._by_context.get(context_hash, ()):
+            key = (query, context_hash)
+            entry = self._entries[key]
+            if entry.embedding is None or self._expired(entry):
+                continue
+            score = float(np.dot(entry.embedding, embedding))
+            if score >= best_score:
+                best, best_score = key, score
+        return best
+
+    def _expired(self, entry: _Entry) -> bool:
+        return time.monotonic() - entry.created > self.ttl
+
+    def _remove(self, key: tuple[str, str]):
+        entry = self._entries.pop(key)
+        self.nbytes -= entry.nbytes
+        queries = self._by_context.get(key[1])
+        if queries is not None:
+            queries.discard(key[0])
+            if not queries:
+                del self._by_context[key[1]]
+
+
+def _unit(embedding: list[float]) -> np.ndarray:
+    vec = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
@@ -1,65 +1,266 @@
-from flask import Flask, request, render_template, session, Response
-from flask_cors import CORS, cross_origin
-import queue, threading, secrets, time, logging
+from quart import Quart, request, render_template, session, Response, jsonify
+from quart_cors import route_cors
+import asyncio, secrets, logging, math, time
+from contextlib import aclosing
+from typing import Optional
 from uuid import uuid4
-from quer import stream_query_agent
-from config import LOGS_DIR
+from quer import prepare_turn, answer_turn, Turn, GENERATIONS, _inflight, answer_cache, embedding_function, session_memory, index_manager, retrieve_batch
+from scheduler import LLMScheduler, SchedulerBusy, Ticket
+from ollama_client import get_ollama_pool
+from streams import StreamRegistry, ResumableStream
+import metrics
+from metrics import Counter, Gauge, Histogram
+from config import (
+    LOGS_DIR, SERVER_BIND, LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_MAX_QUEUED_PER_SESSION,
+    STREAM_REPLAY_BUFFER, STREAM_RESUME_GRACE, STREAM_RETAIN, OLLAMA_REQUIRE_READY,
+    INDEX_WATCH_INTERVAL, ADMIN_TOKEN, RETRIEVE_BATCH_MAX, RETRIEVE_MAX_K, RETRIEVAL_K,
+)
 import os
-from waitress import serve
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
 
-app = Flask(__name__)
+app = Quart(__name__)
 app.secret_key = secrets.token_hex(32)
 
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     filename=os.path.join(LOGS_DIR, 'app.log'),
-    filemode='w'
+    filemode='a'
 )
-CORS(app, resources={r"/stream": {"origins": "*"}}, supports_credentials=False)
+
+llm_scheduler = LLMScheduler(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_MAX_QUEUED_PER_SESSION)
+stream_registry = StreamRegistry(STREAM_REPLAY_BUFFER, STREAM_RESUME_GRACE, STREAM_RETAIN)
+
+ollama_pool = get_ollama_pool()
+
+if session_memory.summarizer:
+    # Summaries are generations too: each takes its turn in the rotation instead
+    # of running on top of LLM_MAX_CONCURRENCY
+    summarize = session_memory.summarizer
+    session_memory.summarizer = lambda session_id, summary, conversation: llm_scheduler.run(
+        f"summary:{session_id}", summarize, session_id, summary, conversation)
+
+STREAM_REQUESTS = Counter("nnrg_stream_requests_total", "/stream requests by outcome", ("outcome",))
+QUEUE_WAIT_SECONDS = Histogram("nnrg_queue_wait_seconds", "Time waiting for an LLM slot")
+TIME_TO_FIRST_TOKEN = Histogram("nnrg_time_to_first_token_seconds", "/stream request to first answer token")
+STREAM_SECONDS = Histogram("nnrg_stream_seconds", "/stream request to last answer token")
+Gauge("nnrg_queue_depth", "Requests waiting for an LLM slot", lambda: llm_scheduler.queued)
+Gauge("nnrg_active_generations", "Requests holding an LLM slot", lambda: llm_scheduler.active)
+Gauge("nnrg_live_streams", "Streams open or kept for resumption", lambda: len(stream_registry))
+Gauge("nnrg_active_sessions", "Sessions with conversation memory", lambda: len(session_memory))
+Gauge("nnrg_process_resident_memory_bytes", "Resident memory of this process", metrics.process_resident_bytes)
+
+@app.before_serving
+async def start_keep_warm():
+    # Preload and pin both models, then keep pinging them for the server's lifetime
+    app.keep_warm_task = asyncio.create_task(ollama_pool.keep_warm())
+
+@app.before_serving
+async def start_index_watch():
+    # Swap in snapshots published by populate_database_copy.py without a restart
+    app.index_watch_task = (asyncio.create_task(index_manager.watch(INDEX_WATCH_INTERVAL))
+                            if INDEX_WATCH_INTERVAL else None)
 
 @app.before_request
-def assign_session():
+async def assign_session():
     if 'session_id' not in session:
         session['session_id'] = str(uuid4())
     logging.info(f"[SESSION] ID: {session['session_id']}")
 
 @app.route('/')
-def home():
-    return render_template('base.html')
+async def home():
+    return await render_template('base.html')
+
+async def run_generation(stream: ResumableStream, ticket: Optional[Ticket], turn: Turn, received: float):
+    """Wait for an LLM slot if the turn needs one, then publish the answer's tokens into `stream`."""
+    try:
+        last_position = None
+        while ticket and not ticket.granted:
+            position = llm_scheduler.position(ticket)
+            if position != last_position:
+                stream.publish("queued", str(position))
+                last_position = position
+            await llm_scheduler.wait(ticket, timeout=1.0)
+        if ticket:
+            QUEUE_WAIT_SECONDS.observe(time.perf_counter() - received)
+        first = True
+        async with aclosing(answer_turn(turn)) as tokens:
+            async for token in tokens:
+                if first:
+                    TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - received)
+                    first = False
+                stream.publish(None, token)
+        STREAM_SECONDS.observe(time.perf_counter() - received)
+    finally:
+        if ticket:
+            llm_scheduler.release(ticket)
+
+def sse_escape(token: str) -> str:
+    # Newlines would end the SSE data line; app.js turns "\n" back into a newline
+    return token.replace('\n', '\\n')
 
 @app.route('/stream', methods=['GET', 'OPTIONS'])
-@cross_origin(origins="*", methods=["GET", "OPTIONS"], send_wildcard=True)
-def stream():
+@route_cors(allow_origin="*", allow_methods=["GET", "OPTIONS"], provide_automatic_options=False)
+async def stream():
     if request.method == 'OPTIONS':
-        return Response(status=200)
+        return Response("", status=200)
 
     message = request.args.get('message', '').strip()
     if not message:
         return Response("Message required", status=400)
 
     session_id = session.get('session_id')
-    logging.info(f"[STREAM] Session {session_id}, Received: {message}")
-
-    token_queue = queue.Queue()
-    threading.Thread(
-        target=stream_query_agent,
-        args=(message, token_queue, session_id),
-        daemon=True
-    ).start()
-
-    def generate():
-        try:
-            while True:
-                token = token_queue.get()
-                if token is None:
-                    break
-                yield f"data: {token.replace('\\n','\\\\n')}\n\n"
-                time.sleep(0.005)
-        except GeneratorExit:
-            token_queue.put(None)
-
-    return Response(generate(), mimetype='text/event-stream')
+    last_event_id = request.headers.get('Last-Event-ID')
+    resumed = stream_registry.resume(last_event_id, session_id)
+    if resumed:
+        live, after = resumed
+        logging.info(f"[STREAM] Session {session_id} resumed stream {live.stream_id} after frame {after}")
+        STREAM_REQUESTS.inc("resumed")
+    elif last_event_id:
+        # The stream is gone; 204 tells EventSource to stop reconnecting instead of re-asking
+        logging.info(f"[STREAM] Session {session_id} unknown Last-Event-ID {last_event_id}")
+        STREAM_REQUESTS.inc("expired")
+        return Response("", status=204)
+    else:
+        # Only new messages wait for the models; a resumed stream is already running
+        if OLLAMA_REQUIRE_READY and not ollama_pool.ready:
+            STREAM_REQUESTS.inc("not_ready")
+            return Response("Models are still loading, please try again shortly", status=503,
+                            headers={"Retry-After": "5"})
+        logging.info(f"[STREAM] Session {session_id}, Received: {message}")
+        received = time.perf_counter()
+        turn = await prepare_turn(message, session_id)
+        ticket = None
+        if turn.needs_llm:
+            # Only generations take an LLM slot; ready-made answers stream straight away
+            try:
+                ticket = llm_scheduler.submit(session_id)
+            except SchedulerBusy as e:
+                logging.warning(f"[STREAM] Session {session_id} rejected: {e}")
+                STREAM_REQUESTS.inc("busy")
+                return Response("Server busy, please try again shortly", status=429, headers={"Retry-After": "5"})
+        STREAM_REQUESTS.inc("accepted")
+        live = stream_registry.start(session_id, lambda s: run_generation(s, ticket, turn, received))
+        after = 0
+
+    async def generate():
+        # Runs on the shared event loop; a client disconnect only detaches this
+        # subscriber, the registry cancels the generation if nobody comes back
+        async with aclosing(stream_registry.subscribe(live, after)) as frames:
+            async for seq, event, data in frames:
+                lines = f"id: {live.stream_id}:{seq}\n"
+                if event:
+                    lines += f"event: {event}\n"
+                yield f"{lines}data: {sse_escape(data)}\n\n"
+        yield "event: done\ndata: \n\n"
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # SSE responses stay open for the whole generation
+    response.timeout = None
+    return response
+
+@app.after_serving
+async def stop_keep_warm():
+    app.keep_warm_task.cancel()
+
+@app.after_serving
+async def stop_index_watch():
+    if app.index_watch_task:
+        app.index_watch_task.cancel()
+
+@app.after_serving
+async def save_caches():
+    # Keep the query-embedding hot set warm across restarts
+    if embedding_function:
+        embedding_function.save()
+
+@app.route('/ready')
+async def ready():
+    if ollama_pool.ready:
+        return jsonify({"ready": True})
+    return jsonify({"ready": False}), 503
+
+def is_admin() -> bool:
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    return bool(ADMIN_TOKEN) and secrets.compare_digest(token, ADMIN_TOKEN)
+
+@app.route('/admin/reload', methods=['POST'])
+async def admin_reload():
+    if not is_admin():
+        return Response("Forbidden", status=403)
+    try:
+        # Loading happens in a worker thread; in-flight requests keep their snapshot
+        reloaded = await asyncio.to_thread(index_manager.reload, request.args.get('force') == '1')
+    except Exception as e:
+        logging.error(f"❌ Index reload failed, still serving the previous snapshot: {e}")
+        return jsonify({"reloaded": False, "error": str(e), **index_manager.stats()}), 500
+    return jsonify({"reloaded": reloaded, **index_manager.stats()})
+
+@app.route('/retrieve/batch', methods=['POST'])
+async def retrieve_batch_endpoint():
+    # Offline jobs only (FAQ precomputation, evaluations); shares the admin token
+    if not is_admin():
+        return Response("Forbidden", status=403)
+    body = await request.get_json(silent=True) or {}
+    queries = body.get('queries')
+    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+        return Response("'queries' must be a list of strings", status=400)
+    if len(queries) > RETRIEVE_BATCH_MAX:
+        return Response(f"At most {RETRIEVE_BATCH_MAX} queries per request", status=413)
+    k = body.get('k', RETRIEVAL_K)
+    if not isinstance(k, int) or isinstance(k, bool) or not 1 <= k <= RETRIEVE_MAX_K:
+        return Response(f"'k' must be an integer from 1 to {RETRIEVE_MAX_K}", status=400)
+    score_threshold = body.get('score_threshold')
+    if score_threshold is not None and (not isinstance(score_threshold, (int, float))
+                                        or isinstance(score_threshold, bool) or not math.isfinite(score_threshold)):
+        return Response("'score_threshold' must be a number", status=400)
+
+    index = index_manager.current
+    if not index:
+        return Response("Vector database is not available", status=503)
+    # FAISS allocates queries x k results; asking for more than the index holds only pads them
+    k = min(k, max(1, len(index.db)))
+    # Embedding and FAISS block; keep them off the event loop
+    try:
+        results = await asyncio.to_thread(retrieve_batch, queries, k, score_threshold, index)
+    except Exception as e:
+        # Usually the embedding model being unreachable
+        logging.error(f"❌ Batch retrieval of {len(queries)} queries failed: {e}")
+        return jsonify({"version": index.version, "error": str(e)}), 502
+    return jsonify({
+        "version": index.version,
+        "results": [
+            [{"id": doc.metadata.get("id"), "source": doc.metadata.get("source"), "score": score,
+              "text": doc.page_content} for doc, score in hits]
+            for hits in results
+        ],
+    })
+
+@app.route('/stats')
+async def stats():
+    return jsonify({
+        "index": index_manager.stats(),
+        "generations": {k: GENERATIONS.value(k) for k in ("completed", "cancelled", "failed")},
+        "scheduler": {"active": llm_scheduler.active, "queued": llm_scheduler.queued},
+        "streams": len(stream_registry),
+        "coalescing": {"in_flight": len(_inflight), "coalesced": _inflight.coalesced},
+        "answer_cache": {"entries": len(answer_cache), "bytes": answer_cache.nbytes, **answer_cache.stats},
+        "memory": session_memory.stats(),
+        "query_embeddings": {
+            "entries": len(embedding_function) if embedding_function else 0,
+            "hits": embedding_function.hits if embedding_function else 0,
+            "misses": embedding_function.misses if embedding_function else 0,
+        },
+    })
+
+@app.route('/metrics')
+async def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
-    serve(app, host='0.0.0.0', port=5000)
\ No newline at end of file
+    config = Config()
+    config.bind = [SERVER_BIND]
+    asyncio.run(serve(app, config))
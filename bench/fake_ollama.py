@@ -0,0 +1,163 @@
+"""
+Stand-in for the Ollama HTTP API, for load tests and CI where no model is available.
+
+Implements what app.py and populate_database_copy.py use: streaming and
+non-streaming /api/generate, /api/embed, /api/embeddings, /api/tags and
+/api/version. Generation and embedding timing is configurable, and at most
+--parallel generations decode at once like OLLAMA_NUM_PARALLEL:
+
+    python bench/fake_ollama.py --port 11435 --token-rate 30 --first-token-delay 0.4
+    OLLAMA_BASE_URL=http://localhost:11435 python app.py
+
+Embeddings come from the deterministic hash embedder, so an index built through
+this server is also searchable through it.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from hash_embeddings import HashEmbeddings
+
+WORDS = ("the", "college", "department", "students", "faculty", "admission", "course", "campus", "placement",
+         "library", "hostel", "semester", "is", "are", "offers", "provides", "for", "and", "with", "of")
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeOllamaServer"
+
+    def log_message(self, format, *args):
+        pass  # thousands of requests per run; keep stderr for errors
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": name, "model": name} for name in self.server.models]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        request = self._read_json()
+        if self.path == "/api/generate":
+            self._generate(request)
+        elif self.path == "/api/embed":
+            inputs = request.get("input", "")
+            texts = [inputs] if isinstance(inputs, str) else list(inputs)
+            time.sleep(self.server.embed_latency * max(1, len(texts)) ** 0.5)
+            self._send_json({"model": request.get("model"), "embeddings": self.server.embedder.embed_documents(texts)})
+        elif self.path == "/api/embeddings":
+            time.sleep(self.server.embed_latency)
+            self._send_json({"embedding": self.server.embedder.embed_query(request.get("prompt", ""))})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _generate(self, request: dict):
+        model, prompt = request.get("model"), request.get("prompt", "")
+        if not prompt:
+            # An empty prompt only loads the model (the keep-warm ping)
+            self._send_json({"model": model, "created_at": _now(), "response": "", "done": True,
+                             "done_reason": "load"})
+            return
+
+        server = self.server
+        rng = random.Random(prompt)
+        tokens = [rng.choice(WORDS) + " " for _ in range(server.tokens)]
+        with server.slots:
+            started = time.perf_counter()
+            # Prefill grows with the prompt, decode runs at a fixed rate
+            time.sleep(server.first_token_delay + server.prefill_per_1k * len(prompt) / 1000)
+            if request.get("stream", True) is False:
+                time.sleep(len(tokens) / server.token_rate)
+                self._send_json({**_final(model, prompt, tokens, started), "response": "".join(tokens)})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for token in tokens:
+                    self._chunk({"model": model, "created_at": _now(), "response": token, "done": False})
+                    time.sleep(1 / server.token_rate)
+                self._chunk({**_final(model, prompt, tokens, started), "response": ""})
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                server.cancelled += 1  # client went away; a real Ollama stops generating too
+
+    def _chunk(self, payload: dict):
+        data = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _final(model: str, prompt: str, tokens: list[str], started: float) -> dict:
+    return {"model": model, "created_at": _now(), "done": True, "done_reason": "stop",
+            "context": list(range(len(prompt) // 4 + len(tokens))),
+            "total_duration": int((time.perf_counter() - started) * 1e9),
+            "prompt_eval_count": len(prompt) // 4, "eval_count": len(tokens)}
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, args):
+        super().__init__(address, FakeOllamaHandler)
+        self.models = args.models
+        self.tokens = args.tokens
+        self.token_rate = args.token_rate
+        self.first_token_delay = args.first_token_delay
+        self.prefill_per_1k = args.prefill_per_1k
+        self.embed_latency = args.embed_latency
+        self.embedder = HashEmbeddings(args.embed_dim)
+        self.slots = threading.Semaphore(args.parallel)
+        self.cancelled = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tokens", type=int, default=120, help="Tokens per answer")
+    parser.add_argument("--token-rate", type=float, default=30.0, help="Decode speed, tokens per second")
+    parser.add_argument("--first-token-delay", type=float, default=0.3, help="Fixed prefill seconds")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.05, help="Extra prefill seconds per 1000 prompt chars")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="Seconds per embedding call")
+    parser.add_argument("--embed-dim", type=int, default=768, help="Must match the index being searched")
+    parser.add_argument("--parallel", type=int, default=4, help="Generations decoding at once")
+    parser.add_argument("--models", nargs="+", default=["nnrgbot", "nomic-embed-text"])
+    args = parser.parse_args()
+
+    server = FakeOllamaServer((args.host, args.port), args)
+    print(f"Fake Ollama on http://{args.host}:{args.port} ({args.token_rate} tok/s, parallel {args.parallel})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
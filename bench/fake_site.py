@@ -0,0 +1,173 @@
+"""
+Stand-in for the college website, for testing extract/ without hitting nnrg.edu.in.
+
+Serves the pages in bench/fixtures/site. Any other *.php path gets a generated
+page (a staff listing for *staff.php), so a full crawl of config.URLS runs
+through; --strict answers those with 404 instead. Latency and transient 503s are
+configurable, and /__stats reports requests and peak concurrency. Pages carry an
+ETag and Last-Modified and conditional requests get 304s (--no-validators turns
+that off); a fixture's Last-Modified is its file mtime, so touching it changes it:
+
+    python bench/fake_site.py --port 8089 --latency 0.2 --fail-rate 0.1
+    cd extract && CRAWL_BASE_URL=http://localhost:8089/ python extract.py
+"""
+import argparse
+import email.utils
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SITE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "site")
+WORDS = ("students", "department", "laboratory", "faculty", "research", "campus", "programme", "placement",
+         "library", "the", "and", "of", "offers", "with", "for", "college", "engineering", "training")
+
+STAFF_ENTRY = """<div class="dropdown"><span>{name}</span><img src="images/{dept}/{slug}.jpg" alt="">
+<table><tr><td><img src="images/icon.png"></td><td>Designation</td><td>{designation}</td></tr>
+<tr><td>E-mail</td><td>{slug}.{dept}@nnrg.edu.in</td></tr></table></div>"""
+
+
+def generated_page(path: str) -> str:
+    """A deterministic page for `path`, shaped like the real site's."""
+    slug = path.strip("/").removesuffix(".php")
+    rng = random.Random(slug)
+    title = slug.replace("-", " ").title()
+    if slug.endswith("staff"):
+        dept = slug[:-len("staff")] or "gen"
+        people = [STAFF_ENTRY.format(name=f"Dr. {first} {dept.upper()}", slug=first.lower(), dept=dept,
+                                     designation=rng.choice(("Professor", "Associate Professor", "Assistant Professor")))
+                  for first in ("Anil", "Bhavani", "Chandra")]
+        body = f'<div id="about" class="clearfix"><div class="grid_4">{"".join(people)}</div></div>'
+    else:
+        paragraphs = (" ".join(rng.choice(WORDS) for _ in range(60)) for _ in range(4))
+        body = "".join(f"<p>{p}.</p>" for p in paragraphs)
+    return (f"<!DOCTYPE html><html><head><title>{title} | NNRG</title></head><body>"
+            f'<div id="stuck_container"><ul><li>Home</li></ul></div><div class="container"><h2>{title}</h2>'
+            f"{body}</div></body></html>")
+
+
+class FakeSiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeSiteServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "text/html; charset=utf-8",
+              validators: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (validators or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_modified(self, validators: dict) -> bool:
+        etag = self.headers.get("If-None-Match")
+        if etag is not None:
+            return etag == validators["ETag"]
+        since = self.headers.get("If-Modified-Since")
+        if since is None:
+            return False
+        try:
+            return email.utils.parsedate_to_datetime(since) >= \
+                email.utils.parsedate_to_datetime(validators["Last-Modified"])
+        except (TypeError, ValueError):
+            return False
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split("?", 1)[0]
+        if path == "/__stats":
+            self._send(200, json.dumps(server.stats()).encode(), "application/json")
+            return
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            time.sleep(server.latency)
+            if server.rng.random() < server.fail_rate:
+                server.failures += 1
+                self._send(503, b"Service Unavailable")
+                return
+            page = self._page(path)
+            if page is None:
+                self._send(404, b"Not Found")
+                return
+            body, modified = page[0].encode("utf-8"), page[1]
+            validators = None
+            if server.validators:
+                validators = {"ETag": f'"{hashlib.sha1(body).hexdigest()}"',
+                              "Last-Modified": email.utils.formatdate(modified, usegmt=True)}
+                if self._not_modified(validators):
+                    server.not_modified += 1
+                    self._send(304, b"", validators=validators)
+                    return
+            self._send(200, body, validators=validators)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _page(self, path: str):
+        """(html, modified time) for `path`, or None."""
+        name = os.path.basename(path) or "index.php"
+        fixture = os.path.join(SITE_DIR, name)
+        if os.path.isfile(fixture):
+            with open(fixture, encoding="utf-8") as f:
+                return f.read(), os.path.getmtime(fixture)
+        if self.server.strict or not name.endswith(".php"):
+            return None
+        return generated_page(name), self.server.started
+
+
+class FakeSiteServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, args):
+        super().__init__(address, FakeSiteHandler)
+        self.latency = args.latency
+        self.fail_rate = args.fail_rate
+        self.strict = args.strict
+        self.validators = not args.no_validators
+        self.started = time.time()
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.not_modified = 0
+        self.active = 0
+        self.peak = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"requests": self.requests, "failures": self.failures, "not_modified": self.not_modified,
+                    "peak_concurrency": self.peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds before each response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--strict", action="store_true", help="404 for pages not in bench/fixtures/site")
+    parser.add_argument("--no-validators", action="store_true",
+                        help="Send no ETag/Last-Modified and never answer 304")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeSiteServer((args.host, args.port), args)
+    print(f"Fake site on http://{args.host}:{args.port}/ serving {SITE_DIR}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
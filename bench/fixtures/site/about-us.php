@@ -0,0 +1,14 @@
+<!DOCTYPE html>
+<html>
+<head><title>About Us | NNRG</title></head>
+<body>
+<div id="stuck_container"><ul><li>Home</li><li>About</li><li>Admissions</li><li>Contact</li></ul></div>
+<div id="slide"><img src="images/slide1.jpg" alt="Campus"></div>
+<div class="container">
+  <h2>About NNRG</h2>
+  <p>Nalla Narasimha Reddy Education Society's Group of Institutions (NNRG) was established in 2008 at Korremula, Ghatkesar, Hyderabad.</p>
+  <p>The group runs a School of Engineering, a School of Pharmacy and a School of Management Sciences, affiliated to JNTU Hyderabad and approved by AICTE.</p>
+  <p>The campus spans 30 acres with laboratories, a central library, hostels and sports facilities.</p>
+</div>
+</body>
+</html>
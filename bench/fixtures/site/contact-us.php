@@ -0,0 +1,12 @@
+<!DOCTYPE html>
+<html>
+<head><title>Contact Us | NNRG</title></head>
+<body>
+<div id="stuck_container"><ul><li>Home</li><li>Contact</li></ul></div>
+<div class="container">
+  <h2>Contact Us</h2>
+  <p>Nalla Narasimha Reddy Education Society's Group of Institutions, Chowdariguda (V), Korremula 'x' Roads, Ghatkesar (M), Medchal District, Telangana 500088.</p>
+  <p>Phone: 040-24006789. Email: info@nnrg.edu.in</p>
+</div>
+</body>
+</html>
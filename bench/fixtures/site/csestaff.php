@@ -0,0 +1,41 @@
+<!DOCTYPE html>
+<html>
+<head><title>CSE Staff | NNRG</title></head>
+<body>
+<div id="stuck_container"><ul><li>Home</li><li>Departments</li></ul></div>
+<div id="about" class="clearfix">
+  <div class="grid_4">
+    <div class="dropdown">
+      <span>Dr. K. Ramesh Kumar</span>
+      <img src="images/cse/ramesh.jpg" alt="">
+      <table>
+        <tr><td><img src="images/icon.png"></td><td>Designation</td><td>Professor &amp; HOD</td></tr>
+        <tr><td><img src="images/icon.png"></td><td>Qualification</td><td>Ph.D (CSE)</td></tr>
+        <tr><td><img src="images/icon.png"></td><td>Experience</td><td>18 Years</td></tr>
+        <tr><td>E-mail</td><td>ramesh.cse@nnrg.edu.in</td></tr>
+        <tr><td>FDP : 12 Journals : 9</td></tr>
+      </table>
+    </div>
+    <div class="dropdown1">
+      <span>Mrs. P. Swathi</span>
+      <img src="images/cse/swathi.jpg" alt="">
+      <table>
+        <tr><td><img src="images/icon.png"></td><td>Designation</td><td>Assistant Professor</td></tr>
+        <tr><td><img src="images/icon.png"></td><td>Qualification</td><td>M.Tech</td></tr>
+        <tr><td>E-mail</td><td>swathi.cse@nnrg.edu.in</td></tr>
+      </table>
+    </div>
+  </div>
+  <div class="grid_4">
+    <div class="dropdown">
+      <span>Mr. A. Srinivas</span>
+      <img src="images/cse/srinivas.jpg" alt="">
+      <table>
+        <tr><td><img src="images/icon.png"></td><td>Designation</td><td>Associate Professor</td></tr>
+        <tr><td>E-mail</td><td>srinivas.cse@nnrg.edu.in, srinivas@gmail.com</td></tr>
+      </table>
+    </div>
+  </div>
+</div>
+</body>
+</html>
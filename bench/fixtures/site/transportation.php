@@ -0,0 +1,7 @@
+<!DOCTYPE html>
+<html>
+<head><title>Transportation | NNRG</title></head>
+<body>
+<div class="container"><h2>Transportation</h2><p>Bus routes are listed on the notice board.</p></div>
+</body>
+</html>
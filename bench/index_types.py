@@ -0,0 +1,139 @@
+"""
+Recall vs latency vs size of the FAISS index types populate_database_copy.py can build.
+
+Runs on the vectors of the published snapshot (or a synthetic corpus with
+--synthetic N) and compares every type against exact flat search:
+
+    python bench/index_types.py --types flat ivf hnsw ivfpq sq8 --k 5
+    python bench/index_types.py --synthetic 200000 --dim 768 --json results.json
+
+Queries are corpus vectors with a little noise added, so the flat results are
+the ground truth without needing Ollama.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import index_store
+from config import FAISS_DIR, FAISS_NPROBE, FAISS_EF_SEARCH
+
+
+# Run in a fresh interpreter: freed pages of earlier indexes would hide the growth here
+_LOAD_RSS = """
+import os, sys, faiss
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+before = rss()
+index = faiss.read_index(sys.argv[1], int(sys.argv[2]))
+print(rss() - before)
+"""
+
+
+def loaded_rss_bytes(path: str, flags: int = 0) -> int:
+    """Resident memory a process gains by loading the index file with read_index `flags`."""
+    result = subprocess.run([sys.executable, "-c", _LOAD_RSS, path, str(flags)],
+                            capture_output=True, text=True, check=True)
+    return int(result.stdout.strip())
+
+
+def load_corpus(args) -> np.ndarray:
+    if args.synthetic:
+        # Clustered data behaves more like real embeddings than uniform noise
+        rng = np.random.default_rng(args.seed)
+        centres = rng.normal(size=(max(1, args.synthetic // 500), args.dim)).astype(np.float32)
+        vectors = centres[rng.integers(len(centres), size=args.synthetic)]
+        vectors += 0.3 * rng.normal(size=vectors.shape).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    current = index_store.resolve(FAISS_DIR)
+    if not current:
+        sys.exit(f"No index snapshot under {FAISS_DIR}; run populate_database_copy.py or pass --synthetic N")
+    return index_store.load_vectors(current[1])
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.integers(len(vectors), size=count)].copy()
+    queries += 0.05 * rng.normal(size=queries.shape).astype(np.float32) * np.abs(queries).mean()
+    return queries
+
+
+def measure(index_type: str, vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    started = time.perf_counter()
+    index = index_store.build_index(vectors, index_type)
+    build_seconds = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, index_store.INDEX_FILE)
+        faiss.write_index(index, path)
+        disk_bytes = os.path.getsize(path)
+        memory_bytes = loaded_rss_bytes(path)
+        # What the server pays per worker: it loads snapshots memory-mapped
+        mmap_memory_bytes = loaded_rss_bytes(path, index_store.mmap_flags(type(faiss.downcast_index(index)).__name__))
+    index_store.set_search_params(index)
+
+    # One query per call, like the server does
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        _, rows = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - started)
+        found[i] = rows[0]
+
+    recall = np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(len(queries))])
+    return {
+        "type": index_type,
+        "index": type(faiss.downcast_index(index)).__name__,
+        "build_seconds": round(build_seconds, 3),
+        f"recall@{k}": round(float(recall), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 4),
+        "disk_bytes": disk_bytes,
+        "memory_bytes": memory_bytes,
+        "mmap_memory_bytes": mmap_memory_bytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--types", nargs="+", default=["flat", "ivf", "hnsw", "ivfpq", "sq8", "ivfsq8"])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--synthetic", type=int, help="Benchmark N synthetic vectors instead of the snapshot")
+    parser.add_argument("--dim", type=int, default=768, help="Size of synthetic vectors")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    vectors = np.ascontiguousarray(load_corpus(args), dtype=np.float32)
+    queries = make_queries(vectors, args.queries, args.seed)
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{len(vectors)} vectors of size {vectors.shape[1]}, {len(queries)} queries, "
+          f"nprobe={FAISS_NPROBE}, efSearch={FAISS_EF_SEARCH}")
+    results = [measure(t, vectors, queries, truth, args.k) for t in args.types]
+
+    columns = list(results[0])
+    widths = [max(len(c), *(len(str(row[c])) for row in results)) for c in columns]
+    print("  ".join(f"{c:>{w}}" for c, w in zip(columns, widths)))
+    for row in results:
+        print("  ".join(f"{row[c]!s:>{w}}" for c, w in zip(columns, widths)))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(vectors), "dim": vectors.shape[1], "k": args.k,
+                       "nprobe": FAISS_NPROBE, "ef_search": FAISS_EF_SEARCH, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Concurrent chat load test against a running app.py.
+
+Each virtual user has its own cookie jar (so its own server-side session) and
+plays conversations from bench/conversations.json: a first question, then
+follow-ups, with think time between turns. Every turn is one /stream SSE
+request read to the end.
+
+    python bench/fake_ollama.py &
+    OLLAMA_BASE_URL=http://localhost:11435 python app.py &
+    python bench/loadtest.py --users 50 --duration 120 --json load.json
+
+Reports throughput, time to first token, inter-token gaps, errors by kind and
+the server's memory growth (read from /metrics).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from collections import Counter
+
+import httpx
+import numpy as np
+
+CONVERSATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "conversations.json")
+
+
+class Turn:
+    def __init__(self, user: int, message: str):
+        self.user = user
+        self.message = message
+        self.outcome = "error"
+        self.ttft = None
+        self.duration = None
+        self.tokens = 0
+        self.gaps: list[float] = []
+
+
+async def run_turn(client: httpx.AsyncClient, turn: Turn):
+    started = time.perf_counter()
+    last_token = None
+    try:
+        async with client.stream("GET", "/stream", params={"message": turn.message}) as response:
+            if response.status_code != 200:
+                turn.outcome = {429: "busy", 503: "not_ready"}.get(response.status_code, f"http_{response.status_code}")
+                await response.aread()
+                return
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    if event is None:
+                        now = time.perf_counter()
+                        if last_token is None:
+                            turn.ttft = now - started
+                        else:
+                            turn.gaps.append(now - last_token)
+                        last_token = now
+                        turn.tokens += 1
+                    elif event == "done":
+                        turn.outcome = "ok" if turn.tokens else "empty"
+                        break
+                elif not line:
+                    event = None
+            else:
+                turn.outcome = "truncated"  # stream ended without the done event
+    except httpx.TimeoutException:
+        turn.outcome = "timeout"
+    except httpx.HTTPError:
+        turn.outcome = "connection_error"
+    finally:
+        turn.duration = time.perf_counter() - started
+
+
+async def virtual_user(user: int, args, conversations: list[list[str]], deadline: float, turns: list[Turn]):
+    rng = random.Random(args.seed + user)
+    # Spread the start over the ramp-up so the server sees a gradual climb
+    await asyncio.sleep(args.ramp_up * user / max(1, args.users))
+    timeout = httpx.Timeout(args.timeout, connect=10)
+    async with httpx.AsyncClient(base_url=args.url, timeout=timeout) as client:
+        while time.perf_counter() < deadline:
+            for message in rng.choice(conversations):
+                if time.perf_counter() >= deadline:
+                    return
+                turn = Turn(user, message)
+                turns.append(turn)
+                await run_turn(client, turn)
+                await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think_time)
+
+
+async def sample_memory(args, samples: list[int], stop: asyncio.Event):
+    async with httpx.AsyncClient(base_url=args.url, timeout=5) as client:
+        while not stop.is_set():
+            try:
+                text = (await client.get("/metrics")).text
+                match = re.search(r"^nnrg_process_resident_memory_bytes (\d+)", text, re.M)
+                if match:
+                    samples.append(int(match.group(1)))
+            except httpx.HTTPError:
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+
+def percentiles(values: list[float], points=(50, 90, 99)) -> dict:
+    if not values:
+        return {}
+    ms = np.asarray(values) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(ms, p)), 1) for p in points} | {"max_ms": round(float(ms.max()), 1)}
+
+
+def report(args, turns: list[Turn], elapsed: float, memory: list[int]) -> dict:
+    ok = [t for t in turns if t.outcome == "ok"]
+    outcomes = Counter(t.outcome for t in turns)
+    return {
+        "params": {"url": args.url, "users": args.users, "duration": args.duration,
+                   "think_time": args.think_time, "ramp_up": args.ramp_up},
+        "requests": len(turns),
+        "outcomes": dict(outcomes),
+        "error_rate": round(1 - len(ok) / len(turns), 4) if turns else 0.0,
+        "throughput": {
+            "answers_per_second": round(len(ok) / elapsed, 3),
+            "tokens_per_second": round(sum(t.tokens for t in ok) / elapsed, 1),
+        },
+        "time_to_first_token": percentiles([t.ttft for t in ok if t.ttft is not None]),
+        "inter_token_gap": percentiles([gap for t in ok for gap in t.gaps]),
+        "answer_duration": percentiles([t.duration for t in ok]),
+        "server_memory": {
+            "start_bytes": memory[0], "end_bytes": memory[-1], "peak_bytes": max(memory),
+            "growth_bytes": memory[-1] - memory[0],
+        } if memory else None,
+    }
+
+
+async def main_async(args) -> dict:
+    with open(CONVERSATIONS, encoding="utf-8") as f:
+        conversations = json.load(f)
+    turns: list[Turn] = []
+    memory: list[int] = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_memory(args, memory, stop))
+
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(virtual_user(u, args, conversations, deadline, turns) for u in range(args.users)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+    return report(args, turns, elapsed, memory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent chat sessions")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to keep starting turns")
+    parser.add_argument("--think-time", type=float, default=3.0, help="Mean seconds between a user's turns")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="Seconds over which users join")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds before a stream read gives up")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
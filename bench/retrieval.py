@@ -0,0 +1,215 @@
+"""
+Offline retrieval quality and latency benchmark.
+
+Builds an index from the fixture corpus (bench/fixtures) exactly the way
+populate_database_copy.py does, runs the questions in bench/golden_set.json
+through quer._search_full, and reports recall@k, MRR, per-stage latency, index
+build time and memory. By default it embeds with the deterministic hash backend,
+so no Ollama is needed and runs are comparable across machines:
+
+    python bench/retrieval.py --json out.json
+    python bench/retrieval.py --chunk-size 500 --score-threshold 1.0 --baseline out.json
+
+A golden-set entry is found when a retrieved chunk comes from the expected
+source file and contains the expected text (chunk ids move whenever the chunk
+size changes, the answer text does not).
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+os.environ.setdefault("EMBEDDING_BACKEND", "hash")
+# Claim the root logger first so the modules below don't truncate the server's log files
+logging.basicConfig(level=logging.WARNING)
+sys.path.append(os.path.dirname(BENCH_DIR))
+import config
+import index_store
+import populate_database_copy as populate
+import quer
+from get_embedding_function_copy import get_embedding_function
+from index_manager import IndexState
+from langchain.schema.document import Document
+from lexical_index import BM25Index
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+GOLDEN_SET = os.path.join(BENCH_DIR, "golden_set.json")
+# Headline metrics compared against --baseline (higher is better for all of them)
+QUALITY_METRICS = ("vector_recall", "vector_mrr", "pipeline_recall", "pipeline_mrr")
+
+
+def load_corpus(directory: str) -> list[Document]:
+    """One Document per page of every .txt file; pages are separated by form feeds."""
+    docs = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".txt"):
+            continue
+        path = os.path.join(directory, name)
+        with open(path, encoding="utf-8") as f:
+            pages = f.read().split("\f")
+        # Relative sources keep chunk ids identical on every machine
+        source = os.path.relpath(path, BENCH_DIR)
+        docs.extend(Document(page_content=page, metadata={"source": source, "page": n})
+                    for n, page in enumerate(pages) if page.strip())
+    return docs
+
+
+def is_relevant(doc: Document, expected: dict) -> bool:
+    return (os.path.basename(str(doc.metadata.get("source", ""))) == expected["source"]
+            and expected["contains"].lower() in doc.page_content.lower())
+
+
+def score_ranking(ranking: list[Document], expected: list[dict], k: int) -> tuple[float, float]:
+    """(recall@k, reciprocal rank of the first relevant chunk) for one question."""
+    top = ranking[:k]
+    found = sum(any(is_relevant(doc, e) for doc in top) for e in expected)
+    first = next((rank for rank, doc in enumerate(top, 1) if any(is_relevant(doc, e) for e in expected)), None)
+    return found / len(expected), 1.0 / first if first else 0.0
+
+
+def percentiles(seconds: list[float]) -> dict:
+    ms = np.asarray(seconds) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "mean_ms": round(float(ms.mean()), 3)}
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def build(args, workdir: str) -> tuple[IndexState, dict[str, Document], dict]:
+    embed_fn = get_embedding_function()
+    pages = load_corpus(os.path.join(FIXTURES_DIR, "corpus"))
+    chunks, chunk_seconds = timed(populate.chunk_documents, pages, args.chunk_size, args.chunk_overlap)
+    docs = chunks + populate.load_csv_documents(os.path.join(FIXTURES_DIR, "faculty_data.csv"))
+
+    vectors, embed_seconds = timed(populate.embed_documents, embed_fn, docs)
+    index, index_seconds = timed(index_store.build_index, vectors, args.index_type)
+    lexical, bm25_seconds = timed(BM25Index.build, [(str(i), d.page_content) for i, d in enumerate(docs)])
+
+    index_store.write_snapshot(workdir, index, docs, vectors, {"version": "bench"})
+    lexical.save(os.path.join(workdir, index_store.BM25_FILE))
+    db = index_store.IndexSnapshot(workdir)
+    state = IndexState("bench", db, BM25Index.load(db.bm25_path), time.time(), 0.0)
+
+    build_stats = {
+        "pages": len(pages),
+        "chunks": len(docs),
+        "embedding_backend": getattr(embed_fn, "model", type(embed_fn).__name__),
+        "chunk_seconds": round(chunk_seconds, 4),
+        "embed_seconds": round(embed_seconds, 4),
+        "index_seconds": round(index_seconds, 4),
+        "bm25_seconds": round(bm25_seconds, 4),
+        "index_type": type(index_store.faiss.downcast_index(index)).__name__,
+        "snapshot_bytes": sum(os.path.getsize(os.path.join(workdir, f)) for f in os.listdir(workdir)),
+    }
+    return state, {d.metadata["id"]: d for d in docs}, build_stats
+
+
+def evaluate(args, state: IndexState, by_id: dict[str, Document]) -> tuple[dict, list[dict]]:
+    with open(GOLDEN_SET, encoding="utf-8") as f:
+        golden = json.load(f)
+    embed_fn = get_embedding_function()
+    timings = {"embed": [], "vector_search": [], "lexical_search": [], "retrieval": []}
+    totals = dict.fromkeys(QUALITY_METRICS, 0.0)
+    details = []
+
+    for item in golden:
+        question, expected = item["question"], item["expected"]
+        embedding, seconds = timed(embed_fn.embed_query, question)
+        timings["embed"].append(seconds)
+        hits, seconds = timed(state.db.similarity_search_with_score_by_vector, embedding, args.k)
+        timings["vector_search"].append(seconds)
+        _, seconds = timed(quer._lexical_search, state, question)
+        timings["lexical_search"].append(seconds)
+        # The whole server-side path: lexical shortcut, embed, search, threshold, fusion, packing
+        retrieval, seconds = timed(quer._search_full, question, config.PROMPT_TOKEN_BUDGET,
+                                   args.score_threshold, index=state)
+        timings["retrieval"].append(seconds)
+
+        vector_recall, vector_rr = score_ranking([doc for doc, _ in hits], expected, args.k)
+        pipeline_docs = [by_id[i] for i in retrieval.doc_ids if i in by_id]
+        pipeline_recall, pipeline_rr = score_ranking(pipeline_docs, expected, len(pipeline_docs))
+        for name, value in zip(QUALITY_METRICS, (vector_recall, vector_rr, pipeline_recall, pipeline_rr)):
+            totals[name] += value
+        details.append({"question": question, "vector_recall": vector_recall, "pipeline_recall": pipeline_recall,
+                        "vector_ids": [doc.metadata.get("id") for doc, _ in hits],
+                        "pipeline_ids": retrieval.doc_ids})
+
+    quality = {name: round(value / len(golden), 4) for name, value in totals.items()}
+    quality["questions"] = len(golden)
+    latency = {stage: percentiles(seconds) for stage, seconds in timings.items()}
+    return {"quality": quality, "latency": latency}, details
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> bool:
+    """Print the change against an earlier run; False if any quality metric dropped."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    ok = True
+    print(f"\nAgainst {baseline_path}:")
+    for name in QUALITY_METRICS:
+        before, after = baseline["quality"][name], results["quality"][name]
+        regressed = after < before - tolerance
+        ok &= not regressed
+        print(f"  {name:16} {before:.4f} -> {after:.4f}{'  REGRESSION' if regressed else ''}")
+    for stage, stats in results["latency"].items():
+        before = baseline["latency"].get(stage, {}).get("p50_ms")
+        if before:
+            print(f"  {stage + ' p50':16} {before:.3f} -> {stats['p50_ms']:.3f} ms")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=config.PDF_CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=config.PDF_CHUNK_OVERLAP)
+    parser.add_argument("--k", type=int, default=config.RETRIEVAL_K)
+    parser.add_argument("--score-threshold", type=float, default=1.2)
+    parser.add_argument("--mode", choices=["hybrid", "vector"], default=config.RETRIEVAL_MODE)
+    parser.add_argument("--index-type", default=config.FAISS_INDEX_TYPE)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--details", action="store_true", help="Include per-question results in the JSON")
+    parser.add_argument("--baseline", help="Compare with an earlier --json output; exit 1 on a quality regression")
+    parser.add_argument("--tolerance", type=float, default=0.01)
+    args = parser.parse_args()
+
+    # The retrieval code reads these module settings on every call
+    quer.RETRIEVAL_K = args.k
+    quer.RETRIEVAL_MODE = args.mode
+
+    with tempfile.TemporaryDirectory() as workdir:
+        state, by_id, build_stats = build(args, workdir)
+        results, details = evaluate(args, state, by_id)
+
+    results = {
+        "params": {"chunk_size": args.chunk_size, "chunk_overlap": args.chunk_overlap, "k": args.k,
+                   "score_threshold": args.score_threshold, "mode": args.mode, "index_type": args.index_type},
+        "build": build_stats,
+        **results,
+        "memory": {"peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024},
+    }
+    if args.details:
+        results["details"] = details
+
+    print(json.dumps({key: results[key] for key in ("params", "build", "quality", "memory")}, indent=2))
+    for stage, stats in results["latency"].items():
+        print(f"{stage:15} p50 {stats['p50_ms']:8.3f} ms   p95 {stats['p95_ms']:8.3f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline and not compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
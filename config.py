@@ -107,16 +107,154 @@ PDF_OUTPUT_DIR = os.path.join(PROJECT_ROOT, "data", "pdfs")
 CSV_OUTPUT_DIR = os.path.join(PROJECT_ROOT, "data", "csvs")
 FACULTY_JSON_PATH = os.path.join(PROJECT_ROOT, "faculty_data.json")
 
+# Crawler: threads in total, simultaneous requests per host, (connect, read)
+# timeouts in seconds, and retries with exponential backoff (backoff * 2^n
+# seconds) on connection errors, 429 and 5xx
+SITE_BASE_URL       = "https://nnrg.edu.in/"
+CRAWL_MAX_WORKERS   = 8
+CRAWL_PER_HOST      = 4
+CRAWL_TIMEOUT       = (5, 20)
+CRAWL_RETRIES       = 3
+CRAWL_BACKOFF       = 0.5
+CRAWL_USER_AGENT    = "NNRG-Etheg-crawler/1.0"
+CRAWL_REPORT_PATH   = os.path.join(LOGS_DIR, "crawl_report.json")
+# Fetch SITE_BASE_URL pages from somewhere else, e.g. the stand-in in
+# bench/fake_site.py (http://localhost:8089/); URLs keep their real names
+CRAWL_BASE_URL      = os.environ.get("CRAWL_BASE_URL")
+# Last response per URL (ETag, Last-Modified, content hash, body). Re-crawls
+# send conditional requests and only changed pages are re-rendered; None
+# disables it. `python extract.py --force` re-renders everything once
+HTTP_CACHE_DIR      = os.path.join(PROJECT_ROOT, "cache", "http")
+
 # ————— POPULATE DATABASE CONFIG —————
 DATA_PATH         = os.path.join(PROJECT_ROOT, "data")
 CSV_PATH          = os.path.join(PROJECT_ROOT, "data", "csvs", "faculty_data.csv")
 FAISS_DIR         = os.path.join(PROJECT_ROOT, "faiss_ollama")
+# Each populate run writes FAISS_DIR/snapshots/<version>/ and then repoints
+# FAISS_DIR/CURRENT; older snapshots beyond this many are deleted
+INDEX_SNAPSHOTS_KEEP = 3
+# PDFs are parsed in PDF_PARSE_WORKERS processes, at most PDF_PARSE_PREFETCH
+# files ahead of the embedder, so memory stays flat however many PDFs there are
+PDF_PARSE_WORKERS  = max(1, (os.cpu_count() or 2) - 1)
+PDF_PARSE_PREFETCH = 8
+
+# Document embeddings are cached across builds in EMBED_STORE_PATH (None disables
+# it), keyed by model and text. Cache misses go to Ollama INDEX_EMBED_BATCH_SIZE
+# texts per call, INDEX_EMBED_CONCURRENCY calls at once, each retried
+# INDEX_EMBED_RETRIES times with backoff.
+EMBED_STORE_PATH        = os.path.join(PROJECT_ROOT, "cache", "embeddings.sqlite")
+INDEX_EMBED_BATCH_SIZE  = 64
+INDEX_EMBED_CONCURRENCY = 4
+INDEX_EMBED_RETRIES     = 3
 PDF_CHUNK_SIZE    = 800
 PDF_CHUNK_OVERLAP = 80
 
+# FAISS index layout: "flat" (exact), "ivf" (IVF-Flat), "hnsw", "ivfpq", "sq8" or
+# "ivfsq8"; anything else is passed to faiss.index_factory as-is. IVF/PQ/SQ are
+# trained on up to FAISS_TRAIN_SAMPLE vectors. A corpus too small to train
+# falls back to flat. Compare the options with bench/index_types.py.
+FAISS_INDEX_TYPE           = "flat"
+FAISS_IVF_NLIST            = None   # None = 4 * sqrt(#vectors)
+FAISS_PQ_M                 = 16     # sub-quantizers, must divide the embedding size
+FAISS_PQ_NBITS             = 8
+FAISS_HNSW_M               = 32
+FAISS_HNSW_EF_CONSTRUCTION = 80
+FAISS_TRAIN_SAMPLE         = 50000
+# Search-time knobs, applied when the server loads a snapshot
+FAISS_NPROBE    = 16
+FAISS_EF_SEARCH = 64
+
 # --- QUERY CONFIG ---
 SPECIAL_KEYWORDS = [
     "faculty", "department", "course", "syllabus", "admission",
     "subject", "placement", "training", "dean", "chairman",
     "hod", "founder", "fee", "head", "nnrg", "college"
 ]
+
+# Answer cache for first-turn questions. Similarity is the cosine between query
+# embeddings above which a different wording reuses an answer (None = exact only)
+ANSWER_CACHE_MAX_ENTRIES = 1024
+ANSWER_CACHE_MAX_BYTES   = 16 * 1024 * 1024
+ANSWER_CACHE_TTL         = 6 * 60 * 60
+ANSWER_CACHE_SIMILARITY  = 0.95
+
+# LRU cache of query embeddings; set the path to None to keep it memory-only
+QUERY_EMBED_CACHE_SIZE = 4096
+QUERY_EMBED_CACHE_PATH = os.path.join(PROJECT_ROOT, "cache", "query_embeddings.npz")
+
+# Conversation memory: LRU/idle eviction, total size cap, and the history token
+# budget per session. With summaries on, turns that fall out of the window are
+# folded into a rolling summary by the LLM, which takes an LLM slot like any
+# other generation (summaries are skipped when the queue is full).
+MEMORY_MAX_SESSIONS    = 2000
+MEMORY_IDLE_TTL        = 30 * 60
+MEMORY_MAX_BYTES       = 64 * 1024 * 1024
+MEMORY_HISTORY_TOKENS  = 1024
+MEMORY_SUMMARY_ENABLED = False
+MEMORY_SUMMARY_TOKENS  = 200
+
+# Retrieval and prompt sizing. The model runs with num_ctx 4096 (chatmodel.txt);
+# PROMPT_TOKEN_BUDGET leaves the rest for the answer and is shared by the
+# template, history and packed context.
+RETRIEVAL_K         = 5
+PROMPT_TOKEN_BUDGET = 3072
+CONTEXT_MIN_TOKENS  = 512
+
+# Continue each session from the token context Ollama returned with its last
+# answer, so a follow-up only prefills the new context and question. A session
+# falls back to the full prompt (history re-sent) when it has none: after
+# eviction, an index reload, an answer that did not come from the LLM, or once
+# the carried context plus the new turn would exceed PROMPT_TOKEN_BUDGET.
+LLM_CONTINUATION = False
+
+# "hybrid" fuses BM25 and vector results with reciprocal-rank fusion; "vector"
+# uses FAISS only. When the top BM25 hit scores at least LEXICAL_ONLY_CONFIDENCE
+# of the best possible score for the query and LEXICAL_ONLY_MARGIN times the
+# runner-up, the embedder is skipped entirely (None disables the shortcut).
+# Otherwise only BM25 hits scoring at least LEXICAL_MIN_SCORE of that best
+# possible score are fused in, the lexical counterpart of the vector threshold.
+RETRIEVAL_MODE          = "hybrid"
+RRF_K                   = 60
+LEXICAL_ONLY_CONFIDENCE = 0.7
+LEXICAL_ONLY_MARGIN     = 1.5
+LEXICAL_MIN_SCORE       = 0.2
+
+# POST /retrieve/batch: most queries per request, largest k, and texts per embedding call
+RETRIEVE_BATCH_MAX  = 512
+RETRIEVE_MAX_K      = 100
+EMBED_BATCH_SIZE    = 64
+
+# --- OLLAMA CONFIG ---
+OLLAMA_BASE_URL           = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+LLM_MODEL                 = "nnrgbot"
+EMBED_MODEL               = "nomic-embed-text"
+# "ollama" embeds with EMBED_MODEL; "hash" is a deterministic offline stand-in
+# (hash_embeddings.py) used by bench/retrieval.py
+EMBEDDING_BACKEND         = os.environ.get("EMBEDDING_BACKEND", "ollama")
+HASH_EMBEDDING_DIM        = 256
+# -1 pins the models in memory; the keep-warm ping reloads them if Ollama restarts
+OLLAMA_KEEP_ALIVE         = -1
+OLLAMA_MAX_CONNECTIONS    = 16
+OLLAMA_KEEP_WARM_INTERVAL = 120
+# Answer /stream with 503 until both models are loaded
+OLLAMA_REQUIRE_READY      = True
+
+# --- SERVER CONFIG ---
+SERVER_BIND = "0.0.0.0:5000"
+
+# Seconds between checks for a newly published index snapshot (None disables the
+# watcher). POST /admin/reload forces a check; it needs ADMIN_TOKEN to be set.
+INDEX_WATCH_INTERVAL = 10
+ADMIN_TOKEN          = os.environ.get("ADMIN_TOKEN")
+
+# Admission control for the LLM: running generations, total waiters, waiters per session
+LLM_MAX_CONCURRENCY        = 2
+LLM_MAX_QUEUE              = 32
+LLM_MAX_QUEUED_PER_SESSION = 1
+
+# Resumable SSE streams: frames kept for Last-Event-ID replay, seconds to wait for a
+# reconnect before cancelling an abandoned generation, seconds to keep finished streams
+# (a new message from the same session cancels its previous generation at once)
+STREAM_REPLAY_BUFFER = 4096
+STREAM_RESUME_GRACE  = 15
+STREAM_RETAIN        = 60
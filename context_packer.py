@@ -0,0 +1,110 @@
+import hashlib
+import re
+from typing import Optional
+
+from langchain.schema.document import Document
+
+from query_utils import estimate_tokens
+
+SEPARATOR = "\n\n---\n\n"
+# Shorter suffix/prefix matches are coincidences, not text the splitter repeated
+MIN_OVERLAP = 20
+
+
+def _parse_chunk_id(chunk_id: str) -> Optional[tuple[str, str, int]]:
+    """Split a PDF chunk id `source:page:idx`; the source path may itself contain ':'."""
+    parts = chunk_id.rsplit(":", 2)
+    if len(parts) != 3 or not parts[2].isdigit():
+        return None
+    return parts[0], parts[1], int(parts[2])
+
+
+def _overlap(left: str, right: str, max_overlap: int) -> int:
+    """
+    Length of the longest suffix of `left` that is also a prefix of `right`,
+    covers whole words and is at least MIN_OVERLAP long; 0 if there is none.
+
+    >>> _overlap("the cat sat on the", "elephant in the room", 80)
+    0
+    >>> _overlap("students may apply for the hostel in June", "apply for the hostel in June or July", 80)
+    28
+    """
+    for size in range(min(max_overlap, len(left), len(right)), MIN_OVERLAP - 1, -1):
+        starts_word = size == len(left) or left[-size - 1].isspace()
+        ends_word = size == len(right) or right[size].isspace()
+        if starts_word and ends_word and left.endswith(right[:size]):
+            return size
+    return 0
+
+
+class _Passage:
+    def __init__(self, rank: int, chunk_id: str, text: str, position: Optional[tuple[str, str, int]]):
+        self.rank = rank
+        self.ids = [chunk_id]
+        self.text = text
+        self.position = position
+
+
+def _merge_neighbours(passages: list[_Passage], max_overlap: int) -> list[_Passage]:
+    """Join chunks that are consecutive on the same page, dropping the text they share."""
+    by_page: dict[tuple[str, str], list[_Passage]] = {}
+    merged: list[_Passage] = []
+    for p in passages:
+        if p.position:
+            by_page.setdefault(p.position[:2], []).append(p)
+        else:
+            merged.append(p)
+
+    for group in by_page.values():
+        group.sort(key=lambda p: p.position[2])
+        current = group[0]
+        for p in group[1:]:
+            if p.position[2] == current.position[2] + 1:
+                cut = _overlap(current.text, p.text, max_overlap)
+                separator = "" if cut else " "
+                current.text = current.text + separator + p.text[cut:]
+                current.ids.extend(p.ids)
+                current.rank = min(current.rank, p.rank)
+                current.position = p.position
+            else:
+                merged.append(current)
+                current = p
+        merged.append(current)
+    return merged
+
+
+def pack_context(docs: list[Document], budget_tokens: int, max_overlap: int) -> tuple[str, list[str]]:
+    """
+    Assemble retrieved chunks (best first) into one context string within a token budget.
+
+    Neighbouring chunks from the same page are merged without the overlap the
+    splitter duplicated, repeated passages are dropped, and the best-ranked
+    passages are packed first. Returns the context and the chunk ids it uses.
+    """
+    seen = set()
+    passages = []
+    for rank, doc in enumerate(docs):
+        text = doc.page_content.strip()
+        digest = hashlib.sha1(re.sub(r"\s+", " ", text.lower()).encode("utf-8")).digest()
+        if not text or digest in seen:
+            continue
+        seen.add(digest)
+        chunk_id = str(doc.metadata.get("id", ""))
+        passages.append(_Passage(rank, chunk_id, text, _parse_chunk_id(chunk_id)))
+
+    passages = sorted(_merge_neighbours(passages, max_overlap), key=lambda p: p.rank)
+
+    parts, ids, used = [], [], 0
+    separator_tokens = estimate_tokens(SEPARATOR)
+    for p in passages:
+        cost = estimate_tokens(p.text) + (separator_tokens if parts else 0)
+        if used + cost <= budget_tokens:
+            parts.append(p.text)
+            ids.extend(p.ids)
+            used += cost
+        elif not parts:
+            # Even the best passage alone is too long; keep its beginning
+            parts.append(p.text[: budget_tokens * 4])
+            ids.extend(p.ids)
+            used = budget_tokens
+    return SEPARATOR.join(parts), ids
@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from query_utils import normalize_query
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Bounded LRU cache in front of an embedding backend's embed_query.
+
+    Keys are (model name, normalized query text), so casing and punctuation
+    variants of the same short question share one embedding call. Document
+    embedding passes straight through. The hot set can be written to an .npz
+    file on shutdown and loaded again at startup. Vectors are held as float32
+    arrays (3 KB for 768 dimensions, against 24 KB as a list of floats) and
+    only turned into lists where LangChain's interface expects them.
+    """
+
+    def __init__(self, inner: Embeddings, max_entries: int, persist_path: Optional[str] = None):
+        self.inner = inner
+        self.model = getattr(inner, "model", type(inner).__name__)
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[tuple[str, str], np.ndarray]" = OrderedDict()
+        # embed_query runs in worker threads (asyncio.to_thread)
+        self._lock = threading.Lock()
+        if persist_path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = (self.model, normalize_query(text))
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return vector.tolist()
+            self.misses += 1
+
+        vector = self.inner.embed_query(text)
+        with self._lock:
+            self._cache[key] = np.asarray(vector, dtype=np.float32)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return vector
+
+    def embed_queries(self, texts: list[str], batch_size: int) -> np.ndarray:
+        """
+        embed_query for many texts, as one float32 matrix: cache hits are reused,
+        misses go out in batches.
+        """
+        keys = [(self.model, normalize_query(text)) for text in texts]
+        vectors: dict[tuple[str, str], np.ndarray] = {}
+        missing: dict[tuple[str, str], str] = {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                vector = self._cache.get(key)
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    vectors[key] = vector
+                elif key not in missing:
+                    self.misses += 1
+                    missing[key] = text
+
+        # The backend embeds queries and documents alike (OllamaEmbeddings.embed_query
+        # is embed_documents of one text), so one call per batch is equivalent
+        pending = list(missing.items())
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            embedded = self.inner.embed_documents([text for _, text in batch])
+            with self._lock:
+                for (key, _), vector in zip(batch, embedded):
+                    vectors[key] = self._cache[key] = np.asarray(vector, dtype=np.float32)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return np.stack([vectors[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.inner.embed_documents(texts)
+
+    def load(self):
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with np.load(self.persist_path, allow_pickle=False) as data:
+                models, texts, vectors = data["models"], data["texts"], data["vectors"]
+            with self._lock:
+                for model, text, vector in zip(models, texts, vectors):
+                    if str(model) == self.model:
+                        self._cache[(self.model, str(text))] = vector
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+            logging.info(f"🔥 Loaded {len(self._cache)} cached query embeddings from {self.persist_path}")
+        except Exception as e:
+            logging.warning(f"⚠️ Could not load query embedding cache: {e}")
+
+    def save(self):
+        if not self.persist_path:
+            return
+        with self._lock:
+            items = list(self._cache.items())
+        if not items:
+            return
+        os.makedirs(os.path.dirname(self.persist_path), exist_ok=True)
+        tmp_path = self.persist_path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            models=np.array([model for (model, _), _ in items]),
+            texts=np.array([text for (_, text), _ in items]),
+            vectors=np.stack([vector for _, vector in items]),
+        )
+        os.replace(tmp_path, self.persist_path)
+        logging.info(f"💾 Saved {len(items)} query embeddings to {self.persist_path}")
@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+T = TypeVar("T")
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+class EmbeddingStore:
+    """
+    Persistent document embeddings in one SQLite file, keyed by the hash of
+    (model, text). Survives --reset and chunk-size experiments, so a rebuild
+    only pays for text the model has never embedded. Not thread-safe: use it
+    from the thread that opened it.
+    """
+
+    def __init__(self, path: str, model: str):
+        self.path = path
+        self.model = model
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL) WITHOUT ROWID"
+        )
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, texts: list[str]) -> dict[str, np.ndarray]:
+        """Stored vectors for whichever of `texts` have one."""
+        by_key = {self.key(text): text for text in texts}
+        keys = list(by_key)
+        found = {}
+        for start in range(0, len(keys), _LOOKUP_CHUNK):
+            chunk = keys[start:start + _LOOKUP_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for key, blob in rows:
+                found[by_key[key]] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, texts: list[str], vectors: list[list[float]]):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            [(self.key(text), np.asarray(vector, dtype=np.float32).tobytes()) for text, vector in zip(texts, vectors)],
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def _embed_with_retry(embed_fn: Embeddings, texts: list[str], retries: int) -> list[list[float]]:
+    for attempt in range(retries + 1):
+        try:
+            return embed_fn.embed_documents(texts)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = 2 ** attempt
+            logging.warning(f"⚠️ Embedding a batch of {len(texts)} failed ({e}), retry in {delay}s")
+            time.sleep(delay)
+
+
+def embed_stream(embed_fn: Embeddings, batches: Iterable[list[T]], text: Callable[[T], str],
+                 concurrency: int, retries: int, store: Optional[EmbeddingStore] = None,
+                 known: Optional[Callable[[list[str]], dict[str, np.ndarray]]] = None,
+                 ) -> Iterator[tuple[list[T], np.ndarray, int]]:
+    """
+    (batch, its vectors, how many were sent to the model) for each batch, in order.
+
+    Texts that `known` or `store` already has a vector for are not sent. Up to
+    `concurrency` batches are embedded at once while the caller produces the
+    next ones; no more are read ahead, so the queue between the two stays
+    bounded. Each call is retried with backoff and its result stored right
+    away, so an interrupted build keeps what it paid for.
+    """
+    # Each entry: (batch, texts, vectors found so far, texts sent, future)
+    pending = deque()
+
+    def finish(entry) -> tuple[list[T], np.ndarray, int]:
+        batch, texts, found, missing, future = entry
+        if future is not None:
+            vectors = future.result()
+            if store is not None:
+                store.put_many(missing, vectors)
+            found.update(zip(missing, np.asarray(vectors, dtype=np.float32)))
+        return batch, np.asarray([found[t] for t in texts], dtype=np.float32), len(missing)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for batch in batches:
+            texts = [text(item) for item in batch]
+            found = known(texts) if known else {}
+            if store is not None:
+                found.update(store.get_many([t for t in texts if t not in found]))
+            missing = list(dict.fromkeys(t for t in texts if t not in found))
+            future = pool.submit(_embed_with_retry, embed_fn, missing, retries) if missing else None
+            pending.append((batch, texts, found, missing, future))
+            while pending and (len(pending) > concurrency or pending[0][4] is None or pending[0][4].done()):
+                yield finish(pending.popleft())
+        while pending:
+            yield finish(pending.popleft())
+
+
+def embed_batched(embed_fn: Embeddings, texts: list[str], batch_size: int, concurrency: int, retries: int,
+                  store: Optional[EmbeddingStore] = None) -> np.ndarray:
+    """embed_documents for a list of texts, through embed_stream."""
+    batches = [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+    results = [vectors for _, vectors, _ in embed_stream(embed_fn, batches, str, concurrency, retries, store)]
+    return np.concatenate(results) if results else np.empty((0, 0), dtype=np.float32)
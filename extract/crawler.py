@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import urlsplit
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import (
+    SITE_BASE_URL, CRAWL_BASE_URL, CRAWL_MAX_WORKERS, CRAWL_PER_HOST, CRAWL_TIMEOUT,
+    CRAWL_RETRIES, CRAWL_BACKOFF, CRAWL_USER_AGENT,
+)
+
+
+@dataclass
+class Page:
+    url: str
+    status: Optional[int] = None
+    content: bytes = b""
+    encoding: Optional[str] = None
+    headers: dict = field(default_factory=dict)
+    seconds: float = 0.0
+    retries: int = 0
+    error: Optional[str] = None
+    # False when an HttpCache saw the same content last time (304 or same hash)
+    changed: bool = True
+
+    @property
+    def ok(self) -> bool:
+        # A 304 counts once the cache has filled in the stored body
+        return self.error is None and self.status is not None and (200 <= self.status < 300 or self.status == 304)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+def fetch_url(url: str) -> str:
+    """Where `url` is actually fetched from: CRAWL_BASE_URL stands in for the live site."""
+    if CRAWL_BASE_URL and url.startswith(SITE_BASE_URL):
+        return CRAWL_BASE_URL.rstrip("/") + "/" + url[len(SITE_BASE_URL):]
+    return url
+
+
+class Crawler:
+    """
+    Fetches pages concurrently over one pooled, keep-alive requests.Session.
+
+    At most `max_workers` requests run at once and at most `per_host` against
+    any one host. Connection errors, 429 and 5xx are retried `retries` times
+    with exponential backoff (honouring Retry-After); every request has a
+    (connect, read) timeout. A failed page comes back with `error` set rather
+    than raising, so one bad URL never stops a crawl.
+    """
+
+    def __init__(self, max_workers: int = CRAWL_MAX_WORKERS, per_host: int = CRAWL_PER_HOST,
+                 timeout=CRAWL_TIMEOUT, retries: int = CRAWL_RETRIES, backoff: float = CRAWL_BACKOFF):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries, backoff_factor=backoff,
+                      status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET", "HEAD"),
+                      respect_retry_after_header=True, raise_on_status=False)
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=max_workers)
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = CRAWL_USER_AGENT
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._hosts: dict[str, threading.Semaphore] = {}
+        self._hosts_lock = threading.Lock()
+
+    def _host_slot(self, url: str) -> threading.Semaphore:
+        host = urlsplit(url).netloc
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.Semaphore(self.per_host)
+            return self._hosts[host]
+
+    def fetch(self, url: str, headers: Optional[dict] = None) -> Page:
+        page = Page(url)
+        target = fetch_url(url)
+        started = time.perf_counter()
+        with self._host_slot(target):
+            try:
+                response = self.session.get(target, timeout=self.timeout, headers=headers)
+                page.status = response.status_code
+                page.content = response.content
+                page.encoding = response.encoding
+                page.headers = {name: response.headers[name] for name in ("ETag", "Last-Modified")
+                                if name in response.headers}
+                page.retries = len(response.raw.retries.history) if response.raw.retries else 0
+                if not (200 <= page.status < 300 or page.status == 304):
+                    page.error = f"HTTP {page.status}"
+            except requests.RequestException as e:
+                page.error = f"{type(e).__name__}: {e}"
+        page.seconds = time.perf_counter() - started
+        if page.error:
+            logging.error(f"[ERROR] {url} -> {page.error}")
+        return page
+
+    def crawl(self, urls: list[str], cache=None) -> dict[str, Page]:
+        """
+        Every URL fetched once, in input order. With an HttpCache the requests
+        are conditional and each page's `changed` says whether its content differs.
+        """
+        unique = list(dict.fromkeys(urls))
+        headers = [cache.conditional_headers(url) if cache else None for url in unique]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pages = list(pool.map(self.fetch, unique, headers))
+        if cache:
+            for page in pages:
+                cache.apply(page)
+        return dict(zip(unique, pages))
+
+    def close(self):
+        self.session.close()
+
+
+def crawl_report(pages: dict[str, Page], seconds: float) -> dict:
+    """Totals, latency and the failures of one crawl."""
+    latencies = np.asarray([p.seconds for p in pages.values()]) * 1000 if pages else np.zeros(1)
+    return {
+        "pages": len(pages),
+        "ok": sum(p.ok for p in pages.values()),
+        "failed": sum(p.error is not None for p in pages.values()),
+        "not_modified": sum(p.status == 304 for p in pages.values()),
+        "changed": sum(p.ok and p.changed for p in pages.values()),
+        "statuses": dict(Counter(str(p.status) for p in pages.values())),
+        "retries": sum(p.retries for p in pages.values()),
+        "bytes": sum(len(p.content) for p in pages.values()),
+        "seconds": round(seconds, 3),
+        "latency_ms": {"p50": round(float(np.percentile(latencies, 50)), 1),
+                       "p95": round(float(np.percentile(latencies, 95)), 1),
+                       "max": round(float(latencies.max()), 1)},
+        "errors": {p.url: p.error for p in pages.values() if p.error},
+    }
+
+
+def write_report(report: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Crawled {report['pages']} pages in {report['seconds']}s: {report['ok']} ok "
+                 f"({report['changed']} changed, {report['not_modified']} not modified), "
+                 f"{report['failed']} failed, {report['retries']} retries. Report: {path}")
@@ -1,9 +1,12 @@
-import requests
 from bs4 import BeautifulSoup
+import argparse
 import json
 import re
 import logging
-from extract_teacher import staff
+import time
+from extract_teacher import parse_staff
+from crawler import Crawler, crawl_report, write_report
+from http_cache import HttpCache
 from docx import Document
 from docx.shared import Pt
 from reportlab.lib.pagesizes import A4
@@ -18,7 +21,7 @@ from convert_csv import faculty_csv
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config import URLS, FACULTY_URLS, DEPARTMENT_KEYWORDS, PDF_OUTPUT_DIR, CSV_OUTPUT_DIR, FACULTY_JSON_PATH, CSV_PATH, LOGS_DIR
+from config import URLS, FACULTY_URLS, DEPARTMENT_KEYWORDS, PDF_OUTPUT_DIR, CSV_OUTPUT_DIR, FACULTY_JSON_PATH, CSV_PATH, LOGS_DIR, CRAWL_REPORT_PATH, HTTP_CACHE_DIR
 
 # Configure logging
 logging.basicConfig(
@@ -68,10 +71,9 @@ faculty_urls = FACULTY_URLS
 def clean_text(text):
     return re.sub(r'\s+', ' ', text).strip()
 
-def extract_text_from_url(url):
+def extract_text_from_html(content, url):
     try:
-        response = requests.get(url, timeout=10)
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = BeautifulSoup(content, 'html.parser')
 
         if url == "https://nnrg.edu.in/transportation.php":
             return """The campus is located at about 17 Km from Secunderabad, Koti and 10 km from Uppal Ring road on Warangal High way. Good fleet of Buses from almost all the corners of the city with well trained drivers has been provided. Transportation Fee may vary from Rs 20,000 to Rs 30,000 depends on the distance. The RTC is also running city buses at good frequency towards Ghatkesar ,Korremula and Narapally .for more detailed info visit https://nnrg.edu.in/transportation.php"""
@@ -99,39 +101,98 @@ def get_name_from_url(url):
             return ' '.join(parts).upper()
     return path.replace("-", " ").replace("_", " ").upper()
 
+def pdf_filename(name):
+    return name.replace("/", "-").replace("\\", "-").replace(":", "-") + ".pdf"
+
 # MAIN EXECUTION
+parser = argparse.ArgumentParser(description="Crawl the college site into data/pdfs and the faculty CSV")
+parser.add_argument("--force", action="store_true", help="Re-render every page, changed or not")
+args = parser.parse_args()
+
+# Fetch every page up front, concurrently over one pooled session; with the
+# HTTP cache the requests are conditional and unchanged pages come back as 304s
+cache = HttpCache(HTTP_CACHE_DIR) if HTTP_CACHE_DIR else None
+crawler = Crawler()
+crawl_started = time.perf_counter()
+pages = crawler.crawl(urls, cache)
+crawler.close()
+write_report(crawl_report(pages, time.perf_counter() - crawl_started), CRAWL_REPORT_PATH)
+
+def needs_render(page, filename):
+    return args.force or page.changed or not os.path.exists(os.path.join(PDF_OUTPUT_DIR, filename))
+
+# The faculty JSON/CSV is built from every faculty page, so any change rebuilds it
+rebuild_faculty = args.force or not os.path.exists(CSV_PATH) or any(
+    pages[url].ok and pages[url].changed for url in faculty_urls if url in pages)
+
+# A faculty page that failed this time must not drop its department from the
+# CSV: parse its last good copy instead, or keep the old CSV if there is none
+restored = set()
+if rebuild_faculty:
+    for url in faculty_urls:
+        page = pages.get(url)
+        if page is None or page.ok:
+            continue
+        if cache and cache.restore(page):
+            logging.warning(f"Using the cached copy of {url} for the faculty CSV ({page.error})")
+            restored.add(url)
+        elif os.path.exists(CSV_PATH):
+            logging.warning(f"{url} failed and is not cached, keeping {CSV_PATH}")
+            rebuild_faculty = False
+
 faculty_data = []
+rendered = skipped = 0
 for url in urls:
     name = get_name_from_url(url)
+    page = pages[url]
+    if not page.ok and url not in restored:
+        continue  # logged by the crawler and listed in the crawl report
+    safe_filename = pdf_filename(name)
+    render = needs_render(page, safe_filename)
+    if not render and not (url in faculty_urls and rebuild_faculty):
+        skipped += 1
+        continue
     logging.info(f"Processing: {name} -> {url}")
 
     if url in faculty_urls:
         # Generate individual PDF directly for faculty
         try:
-            data = staff(url)
-            safe_filename = name.replace("/", "-").replace("\\", "-").replace(":", "-") + ".pdf"
-            save_to_pdf([{"name": name, "data": data}], filename=safe_filename)
+            data = parse_staff(page.text, url)
+            if render:
+                save_to_pdf([{"name": name, "data": data}], filename=safe_filename)
+                rendered += 1
             faculty_data.append(data)
             
         except Exception as e:
             logging.error(f"Error extracting faculty from {url}: {e}")
+            if cache:
+                cache.forget(url)
     else:
-        text = extract_text_from_url(url)
+        text = extract_text_from_html(page.content, url)
         if text:
-            safe_filename = name.replace("/", "-").replace("\\", "-").replace(":", "-") + ".pdf"
             save_to_pdf([{"name": name, "data": text}], filename=safe_filename)
+            rendered += 1
+        elif cache:
+            cache.forget(url)
+
+if cache:
+    cache.save()
+logging.info(f"📄 {rendered} pages rendered, {skipped} unchanged and skipped")
 
-# Ensure the CSV directory exists
-os.makedirs(CSV_OUTPUT_DIR, exist_ok=True)
+if rebuild_faculty:
+    # Ensure the CSV directory exists
+    os.makedirs(CSV_OUTPUT_DIR, exist_ok=True)
 
-from json_encoder import PydanticEncoder
-# Save faculty data to JSON
-with open(FACULTY_JSON_PATH, 'w') as json_file:
-    json.dump(faculty_data, json_file, indent=4, cls=PydanticEncoder)
+    from json_encoder import PydanticEncoder
+    # Save faculty data to JSON
+    with open(FACULTY_JSON_PATH, 'w') as json_file:
+        json.dump(faculty_data, json_file, indent=4, cls=PydanticEncoder)
 
-# Convert JSON to CSV using the faculty_csv function
-try:
-    faculty_csv(FACULTY_JSON_PATH, CSV_PATH)
-    logging.info(f"Successfully converted faculty data to CSV at {CSV_PATH}")
-except Exception as e:
-    logging.error(f"Error converting to CSV: {e}")
+    # Convert JSON to CSV using the faculty_csv function
+    try:
+        faculty_csv(FACULTY_JSON_PATH, CSV_PATH)
+        logging.info(f"Successfully converted faculty data to CSV at {CSV_PATH}")
+    except Exception as e:
+        logging.error(f"Error converting to CSV: {e}")
+else:
+    logging.info(f"Faculty CSV not rebuilt, keeping {CSV_PATH}")
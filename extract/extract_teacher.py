@@ -26,8 +26,12 @@ def staff(url):
     except requests.exceptions.RequestException as e:
         logging.error(f"Error fetching {url}: {e}")
         return []
+    return parse_staff(resp.text, url)
 
-    soup = BeautifulSoup(resp.text, 'html.parser')
+
+# 2) parse an already fetched staff page (extract.py fetches them with the crawler)
+def parse_staff(html, url):
+    soup = BeautifulSoup(html, 'html.parser')
     about = soup.find('div', id='about', class_='clearfix')
     if not about:
         logging.warning(f"Could not find the #about section in {url}")
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from crawler import Page
+
+INDEX_FILE = "index.json"
+
+
+class HttpCache:
+    """
+    Last response per URL on disk: its ETag, Last-Modified, content hash and body.
+
+    Before a fetch, conditional_headers() gives the validators to send; after it,
+    apply() decides whether the page changed. A 304 is answered from the stored
+    body, and a 200 whose body hashes the same as last time (servers without
+    validators) also counts as unchanged. Nothing is recorded as seen until
+    save(), so a run that dies halfway redoes its pages next time.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._entries: dict[str, dict] = {}
+        self._pending: dict[str, dict] = {}
+        try:
+            with open(os.path.join(directory, INDEX_FILE), encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"HTTP cache index unreadable, starting empty: {e}")
+
+    def _body_path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html")
+
+    def conditional_headers(self, url: str) -> dict:
+        entry = self._entries.get(url)
+        if not entry or not os.path.exists(self._body_path(url)):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def apply(self, page: Page):
+        """Set page.changed, filling in the stored body for a 304."""
+        entry = self._entries.get(page.url)
+        if page.status == 304:
+            if entry is None:
+                page.error = "HTTP 304 without a cached copy"
+                return
+            with open(self._body_path(page.url), "rb") as f:
+                page.content = f.read()
+            page.encoding = entry.get("encoding")
+            page.changed = False
+            return
+        if not page.ok:
+            return
+        digest = hashlib.sha256(page.content).hexdigest()
+        page.changed = entry is None or entry.get("sha256") != digest
+        if page.changed:
+            with open(self._body_path(page.url), "wb") as f:
+                f.write(page.content)
+        self._pending[page.url] = {
+            "etag": page.headers.get("ETag"),
+            "last_modified": page.headers.get("Last-Modified"),
+            "sha256": digest,
+            "encoding": page.encoding,
+            "fetched_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+    def restore(self, page: Page) -> bool:
+        """Give a failed page its last good body (as unchanged); False if none is cached."""
+        entry = self._entries.get(page.url)
+        if entry is None or not os.path.exists(self._body_path(page.url)):
+            return False
+        with open(self._body_path(page.url), "rb") as f:
+            page.content = f.read()
+        page.encoding = entry.get("encoding")
+        page.changed = False
+        return True
+
+    def forget(self, url: str):
+        """Treat `url` as changed next time, e.g. because processing it failed."""
+        self._pending.pop(url, None)
+        self._entries.pop(url, None)
+
+    def get(self, url: str) -> Optional[dict]:
+        return self._entries.get(url)
+
+    def save(self):
+        self._entries.update(self._pending)
+        self._pending.clear()
+        tmp_path = os.path.join(self.directory, INDEX_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.directory, INDEX_FILE))
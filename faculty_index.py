@@ -0,0 +1,162 @@
+import csv
+import re
+from typing import Optional
+
+from config import DEPARTMENT_KEYWORDS
+
+# Words that appear in the college's own name; never treat them as a faculty name match
+_COLLEGE_NAME_PARTS = {"nalla", "narasimha", "narsimha", "narsihma", "reddy", "nnrg", "group", "institutions"}
+# Department aliases that are also ordinary English words
+_AMBIGUOUS_ALIASES = {"me"}
+_DEPARTMENT_FILLER = {"and", "of", "engineering", "school", "sciences"}
+
+_FIELD_KEYWORDS = {
+    "email": ("email", "mail", "contact"),
+    "designation": ("designation", "position", "role", "post"),
+    "qualification": ("qualification", "qualified", "degree", "phd"),
+    "experience": ("experience", "experienced"),
+    "department": ("department", "dept", "branch"),
+}
+
+
+def normalize_name(name: str) -> list[str]:
+    name_field = str(name).strip()
+    no_hon = re.sub(r"(?i)\b(mr|ms|mrs|dr)\.\s*", "", name_field).strip()
+    normalized_parts = [f"name_normalized: {no_hon.lower()}"]
+    for p in re.split(r"\s+|\.", no_hon):
+        if len(p) > 1:
+            normalized_parts.append(f"name_part: {p.lower()}")
+    return normalized_parts
+
+
+def _tokens(text: str) -> set[str]:
+    return set(re.findall(r"[a-z0-9]+", str(text).lower()))
+
+
+def _department_matchers() -> list[tuple[str, set[str], set[str]]]:
+    """(department, alias tokens, words that together name it) for every department."""
+    aliases: dict[str, set[str]] = {}
+    for alias, department in DEPARTMENT_KEYWORDS.items():
+        aliases.setdefault(department, set())
+        if "-" not in alias:
+            aliases[department].add(alias)
+    matchers = []
+    for department, names in aliases.items():
+        words = (_tokens(department) - _DEPARTMENT_FILLER) or (_tokens(department) - {"and", "of"})
+        matchers.append((department, names, words))
+    return matchers
+
+
+_DEPARTMENTS = _department_matchers()
+
+
+def display_department(department: str) -> str:
+    return re.sub(r"\b(And|Of)\b", lambda m: m.group(0).lower(), department.title())
+
+
+def find_department(text: str, allow_ambiguous: bool = False) -> Optional[str]:
+    tokens = _tokens(text)
+    for department, aliases, words in _DEPARTMENTS:
+        usable = aliases if allow_ambiguous else aliases - _AMBIGUOUS_ALIASES
+        if tokens & usable or words <= tokens:
+            return department
+    return None
+
+
+class FacultyIndex:
+    """
+    In-memory lookup over faculty_data.csv by name, department and designation.
+
+    Answers the common faculty questions (who is the HOD of X, what is Y's email or
+    designation) straight from the table, without retrieval or the LLM.
+    """
+
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.by_name: dict[str, list[int]] = {}
+        self.by_name_part: dict[str, set[int]] = {}
+        self.by_department: dict[str, list[int]] = {}
+        self.by_designation: dict[str, list[int]] = {}
+        for i, row in enumerate(rows):
+            for entry in normalize_name(row.get("name", "")):
+                key, _, value = entry.partition(": ")
+                if key == "name_normalized":
+                    self.by_name.setdefault(value, []).append(i)
+                elif value not in _COLLEGE_NAME_PARTS:
+                    self.by_name_part.setdefault(value, set()).add(i)
+            department = self._row_department(row)
+            if department:
+                row["department"] = department
+                self.by_department.setdefault(department, []).append(i)
+            designation = row.get("designation", "").strip().lower()
+            if designation:
+                self.by_designation.setdefault(designation, []).append(i)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "FacultyIndex":
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [{k.strip().lower(): (v or "").strip() for k, v in row.items() if k} for row in csv.DictReader(f)]
+        return cls(rows)
+
+    @staticmethod
+    def _row_department(row: dict) -> Optional[str]:
+        # convert_csv often leaves department blank; the photo path and email still name it
+        for field in ("department", "photo_url", "email"):
+            department = find_department(row.get(field, "").replace("/", " "), allow_ambiguous=True)
+            if department:
+                return department
+        return None
+
+    def answer(self, query: str) -> Optional[str]:
+        """A complete answer for the faculty questions we can resolve, otherwise None."""
+        tokens = _tokens(query)
+        return self._answer_hod(query, tokens) or self._answer_person(query, tokens)
+
+    def _answer_hod(self, query: str, tokens: set[str]) -> Optional[str]:
+        if not ("hod" in tokens or "head" in tokens):
+            return None
+        department = find_department(query)
+        if not department:
+            return None
+        in_department = set(self.by_department.get(department, []))
+        heads = [self.rows[i] for designation, ids in self.by_designation.items()
+                 if re.search(r"\b(hod|head)\b", designation) for i in ids if i in in_department]
+        if len(heads) != 1:
+            return None
+        head = heads[0]
+        answer = f"{head['name']} is the Head of the Department of {display_department(department)}."
+        if head.get("email"):
+            answer += f" You can reach them at {head['email']}."
+        return answer
+
+    def _answer_person(self, query: str, tokens: set[str]) -> Optional[str]:
+        fields = [field for field, words in _FIELD_KEYWORDS.items() if tokens & set(words)]
+        if not fields and "who" not in tokens:
+            return None
+
+        # A full name in the question wins; otherwise rank rows by matching name parts
+        spaced = f" {' '.join(re.findall(r'[a-z0-9]+', query.lower()))} "
+        exact = [i for name, ids in self.by_name.items() if f" {name} " in spaced for i in ids]
+        if exact:
+            matches = [self.rows[i] for i in exact]
+        else:
+            scores: dict[int, int] = {}
+            for part in tokens:
+                for i in self.by_name_part.get(part, ()):
+                    scores[i] = scores.get(i, 0) + 1
+            if not scores:
+                return None
+            best = max(scores.values())
+            matches = [self.rows[i] for i, score in scores.items() if score == best]
+        if len(matches) > 3:
+            return None  # too ambiguous, let retrieval + the LLM sort it out
+
+        lines = []
+        for row in matches:
+            wanted = fields or ["designation", "department", "email"]
+            details = [f"{field}: {display_department(row[field]) if field == 'department' else row[field]}"
+                       for field in wanted if row.get(field)]
+            if not details:
+                return None
+            lines.append(f"{row['name']} - " + ", ".join(details))
+        return "\n".join(lines)
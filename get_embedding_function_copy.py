@@ -1,5 +1,10 @@
-from langchain_ollama import OllamaEmbeddings
+from ollama_client import get_ollama_pool
+from config import EMBEDDING_BACKEND, HASH_EMBEDDING_DIM
 def get_embedding_function():
-    embeddings = OllamaEmbeddings(model="nomic-embed-text")
+    if EMBEDDING_BACKEND == "hash":
+        # Offline stand-in for benchmarks; indexes built with it only work with it
+        from hash_embeddings import HashEmbeddings
+        return HashEmbeddings(HASH_EMBEDDING_DIM)
+    # Shared, pooled OllamaEmbeddings client (model and keep_alive come from config)
+    embeddings = get_ollama_pool().embeddings
     return embeddings
-
@@ -0,0 +1,45 @@
+import hashlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from lexical_index import tokenize
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic, dependency-free stand-in for the Ollama embedder.
+
+    Words and their character trigrams are hashed into `dim` signed buckets and
+    the vector is L2-normalised, so texts sharing vocabulary land close together.
+    It knows nothing about meaning; use it for offline benchmarks and tests of the
+    pipeline, never to judge the real embedding model.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.model = f"hash-{dim}"
+
+    @staticmethod
+    def _features(text: str) -> list[tuple[str, float]]:
+        # Whole words weigh more than their trigrams; trigrams catch spelling variants
+        features = []
+        for word in tokenize(text):
+            features.append((f"w:{word}", 1.0))
+            padded = f"#{word}#"
+            features.extend((f"t:{padded[i:i + 3]}", 0.5) for i in range(len(padded) - 2))
+        return features
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dim] += weight if digest >> 63 else -weight
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
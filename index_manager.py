@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, NamedTuple, Optional
+
+import index_store
+from index_store import IndexSnapshot
+from lexical_index import BM25Index
+
+
+class IndexState(NamedTuple):
+    version: str
+    db: IndexSnapshot
+    lexical: Optional[BM25Index]
+    loaded_at: float
+    load_seconds: float
+
+
+class IndexManager:
+    """
+    Holds the index snapshot that new requests search, and swaps in newer ones.
+
+    A request reads `current` once and keeps that state for its whole lifetime,
+    so a reload never changes the index under a running search. `reload` builds
+    the new state completely (in a worker thread when called from `watch`) before
+    replacing the reference; the old snapshot is dropped once its last request ends.
+    `on_swap` is called from whichever thread ran the reload.
+    """
+
+    def __init__(self, root: str, on_swap: Optional[Callable[[IndexState], None]] = None):
+        self.root = root
+        self.on_swap = on_swap
+        self.current: Optional[IndexState] = None
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def pending(self) -> Optional[str]:
+        """Version CURRENT points at, if it differs from the one being served."""
+        target = index_store.resolve(self.root)
+        if target and (self.current is None or target[0] != self.current.version):
+            return target[0]
+        return None
+
+    def reload(self, force: bool = False) -> bool:
+        """Load the published snapshot and swap it in; False if nothing changed."""
+        with self._lock:
+            target = index_store.resolve(self.root)
+            if target is None:
+                raise FileNotFoundError(f"No index snapshot under {self.root}")
+            version, directory = target
+            if not force and self.current and self.current.version == version:
+                return False
+
+            started = time.perf_counter()
+            try:
+                db = IndexSnapshot(directory)
+                try:
+                    lexical = BM25Index.load(db.bm25_path)
+                except Exception as e:
+                    logging.warning(f"⚠️ BM25 index unavailable for {version}, vector search only: {e}")
+                    lexical = None
+            except Exception as e:
+                self.last_error = f"{version}: {e}"
+                raise
+            state = IndexState(version, db, lexical, time.time(), time.perf_counter() - started)
+
+            previous = self.current.version if self.current else None
+            self.current = state
+            self.reloads += 1
+            self.last_error = None
+        logging.info(f"🔄 Index {version} active ({len(db)} chunks, loaded in {state.load_seconds:.2f}s"
+                     + (f", replacing {previous})" if previous else ")"))
+        if self.on_swap:
+            self.on_swap(state)
+        return True
+
+    async def watch(self, interval: float):
+        """Poll CURRENT and load newly published snapshots off the event loop."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self.pending():
+                    await asyncio.to_thread(self.reload)
+            except Exception as e:
+                logging.error(f"❌ Index reload failed, still serving the previous snapshot: {e}")
+
+    def stats(self) -> dict:
+        state = self.current
+        return {
+            "version": state.version if state else None,
+            "chunks": len(state.db) if state else 0,
+            "loaded_at": datetime.fromtimestamp(state.loaded_at).isoformat(timespec="seconds") if state else None,
+            "load_seconds": round(state.load_seconds, 3) if state else None,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,310 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+from array import array
+from collections import Counter
+from typing import Optional, Union
+
+import faiss
+import numpy as np
+from langchain.schema.document import Document
+
+from config import (
+    FAISS_INDEX_TYPE, FAISS_IVF_NLIST, FAISS_PQ_M, FAISS_PQ_NBITS, FAISS_HNSW_M,
+    FAISS_HNSW_EF_CONSTRUCTION, FAISS_TRAIN_SAMPLE, FAISS_NPROBE, FAISS_EF_SEARCH,
+)
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks.idx.npy"
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.npy"
+BM25_FILE = "bm25.json"
+MANIFEST_FILE = "manifest.json"
+VECTORS_RAW_FILE = "vectors.f32"
+SNAPSHOTS_DIR = "snapshots"
+# Rows handed to faiss per add() call, and copied per step when finishing vectors.npy
+ADD_BATCH = 65536
+CURRENT_FILE = "CURRENT"
+
+
+def factory_string(index_type: str, n: int, dim: int) -> str:
+    """faiss.index_factory description for `index_type` over n vectors of size dim."""
+    nlist = FAISS_IVF_NLIST or int(4 * np.sqrt(n))
+    # k-means wants ~39 training points per centroid
+    nlist = max(1, min(nlist, n // 39))
+    layouts = {
+        "flat": "Flat",
+        "ivf": f"IVF{nlist},Flat",
+        "hnsw": f"HNSW{FAISS_HNSW_M},Flat",
+        "ivfpq": f"IVF{nlist},PQ{FAISS_PQ_M}x{FAISS_PQ_NBITS}",
+        "sq8": "SQ8",
+        "ivfsq8": f"IVF{nlist},SQ8",
+    }
+    description = layouts.get(index_type, index_type)
+    if "PQ" in description and dim % FAISS_PQ_M:
+        raise ValueError(f"FAISS_PQ_M={FAISS_PQ_M} does not divide the embedding size {dim}")
+    return description
+
+
+def build_index(vectors: np.ndarray, index_type: str = FAISS_INDEX_TYPE) -> faiss.Index:
+    """Build (training if needed) and fill an L2 index of the configured type."""
+    n, dim = vectors.shape
+    description = factory_string(index_type, n, dim)
+    index = faiss.index_factory(dim, description, faiss.METRIC_L2)
+    if not index.is_trained:
+        # PQ codebooks need 2^nbits points per sub-quantizer, IVF at least one per list
+        needed = 2 ** FAISS_PQ_NBITS if "PQ" in description else 1
+        if n < needed:
+            logging.warning(f"⚠️ {n} vectors are too few to train {description}, using a flat index")
+            return build_index(vectors, "flat")
+        sample = vectors
+        if n > FAISS_TRAIN_SAMPLE:
+            rows = np.random.default_rng(0).choice(n, FAISS_TRAIN_SAMPLE, replace=False)
+            sample = vectors[np.sort(rows)]
+        index.train(sample)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = FAISS_HNSW_EF_CONSTRUCTION
+    # In slices, so memory-mapped vectors are paged in a block at a time
+    for start in range(0, n, ADD_BATCH):
+        index.add(np.ascontiguousarray(vectors[start:start + ADD_BATCH]))
+    return index
+
+
+def set_search_params(index: faiss.Index, nprobe: int = FAISS_NPROBE, ef_search: int = FAISS_EF_SEARCH):
+    """Apply the search-time knobs of whatever index type was loaded."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+
+
+class CompactDocstore:
+    """
+    Chunk text and metadata in one flat file plus an offsets array.
+
+    Record i lives at chunks.bin[offsets[i]:offsets[i + 1]] as UTF-8 JSON. Both
+    files are memory-mapped and records are decoded only when asked for, so
+    every worker shares the same pages through the OS page cache. Docstore ids
+    are the record positions as strings, matching the FAISS row numbers.
+    """
+
+    def __init__(self, directory: str):
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(directory, CHUNKS_FILE), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get(self, i: int) -> Document:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        record = json.loads(self._data[start:end].decode("utf-8"))
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+    def search(self, doc_id: str) -> Union[Document, str]:
+        # Same contract as LangChain's Docstore.search
+        if not doc_id.isdigit() or int(doc_id) >= len(self):
+            return f"ID {doc_id} not found."
+        return self.get(int(doc_id))
+
+
+def mmap_flags(index_class: str) -> int:
+    """
+    read_index flags that map an index's codes from the file instead of copying
+    them into memory. IO_FLAG_MMAP only covers IVF inverted lists; flat, SQ, PQ
+    and HNSW keep their codes in an IndexFlatCodes, which needs IO_FLAG_MMAP_IFC.
+    FAISS rejects the two together on an IVF index.
+    """
+    mmap = faiss.IO_FLAG_MMAP if index_class.startswith("IndexIVF") else faiss.IO_FLAG_MMAP_IFC
+    return mmap | faiss.IO_FLAG_READ_ONLY
+
+
+class IndexSnapshot:
+    """A FAISS index and its CompactDocstore, as written by write_snapshot."""
+
+    def __init__(self, directory: str, mmap_index: bool = True):
+        self.directory = directory
+        self.bm25_path = os.path.join(directory, BM25_FILE)
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        flags = mmap_flags(self.meta.get("index_type", "")) if mmap_index else 0
+        self.index = faiss.read_index(os.path.join(directory, INDEX_FILE), flags)
+        set_search_params(self.index)
+        self.docstore = CompactDocstore(directory)
+
+    def __len__(self) -> int:
+        return self.index.ntotal
+
+    def similarity_search_with_score_by_vector(self, embedding: list[float], k: int = 4) -> list[tuple[Document, float]]:
+        """Nearest chunks with their (squared L2) distances, lower is better."""
+        return self.search_by_vectors(np.asarray([embedding], dtype=np.float32), k)[0]
+
+    def search_by_vectors(self, queries: np.ndarray, k: int) -> list[list[tuple[Document, float]]]:
+        """Nearest chunks for every row of `queries`, in one FAISS search call."""
+        distances, rows = self.index.search(np.ascontiguousarray(queries, dtype=np.float32), k)
+        return [[(self.docstore.get(int(row)), float(dist)) for row, dist in zip(row_ids, row_distances) if row >= 0]
+                for row_ids, row_distances in zip(rows, distances)]
+
+
+def exists(directory: str) -> bool:
+    return all(os.path.exists(os.path.join(directory, name))
+               for name in (INDEX_FILE, CHUNKS_FILE, OFFSETS_FILE, META_FILE))
+
+
+def load_vectors(directory: str, mmap: bool = False) -> np.ndarray:
+    """The exact vectors a snapshot was built from (the index itself may be lossy)."""
+    path = os.path.join(directory, VECTORS_FILE)
+    if os.path.exists(path):
+        return np.load(path, mmap_mode="r" if mmap else None)
+    index = faiss.read_index(os.path.join(directory, INDEX_FILE))
+    return index.reconstruct_n(0, index.ntotal)
+
+
+class SnapshotWriter:
+    """
+    Writes a snapshot a batch at a time, so a corpus never has to fit in memory.
+
+    add() appends chunk records and raw vectors to disk; close() builds the
+    index over the memory-mapped vectors and moves every file into place.
+    Row i of the index is the i-th document added.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.count = 0
+        self.dim = None
+        self.sources = Counter()
+        self._offsets = array("q", [0])
+        self._chunks = open(self._tmp(CHUNKS_FILE), "wb")
+        self._vectors = open(self._tmp(VECTORS_RAW_FILE), "wb")
+
+    def _tmp(self, name: str) -> str:
+        return os.path.join(self.directory, name + ".tmp")
+
+    def add(self, docs: list[Document], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(docs) != len(vectors):
+            raise ValueError(f"{len(docs)} documents but {len(vectors)} vectors")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        for doc in docs:
+            record = json.dumps({"text": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False)
+            self._offsets.append(self._offsets[-1] + self._chunks.write(record.encode("utf-8")))
+            self.sources[os.path.basename(str(doc.metadata.get("source", "")))] += 1
+        self._vectors.write(vectors.tobytes())
+        self.count += len(docs)
+
+    def close(self, extra_meta: Optional[dict] = None, index: Optional[faiss.Index] = None,
+              index_type: str = FAISS_INDEX_TYPE) -> faiss.Index:
+        """Finish the snapshot; builds an `index_type` index unless one is given."""
+        self._chunks.close()
+        self._vectors.close()
+        if not self.count:
+            raise ValueError("Cannot write an empty snapshot")
+        raw = np.memmap(self._tmp(VECTORS_RAW_FILE), dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        if index is None:
+            index = build_index(raw, index_type)
+        faiss.write_index(index, self._tmp(INDEX_FILE))
+        with open(self._tmp(OFFSETS_FILE), "wb") as f:
+            np.save(f, np.frombuffer(self._offsets, dtype=np.int64))
+        # Kept for rebuilds: PQ/SQ indexes cannot give the original vectors back
+        out = np.lib.format.open_memmap(self._tmp(VECTORS_FILE), mode="w+", dtype=np.float32, shape=raw.shape)
+        for start in range(0, self.count, ADD_BATCH):
+            out[start:start + ADD_BATCH] = raw[start:start + ADD_BATCH]
+        out.flush()
+        del out, raw
+        os.remove(self._tmp(VECTORS_RAW_FILE))
+
+        meta = {
+            "count": self.count,
+            "dim": self.dim,
+            "index_type": type(faiss.downcast_index(index)).__name__,
+            "sources": dict(self.sources),
+            **(extra_meta or {}),
+        }
+        with open(self._tmp(META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        for name in (CHUNKS_FILE, OFFSETS_FILE, VECTORS_FILE, INDEX_FILE, META_FILE):
+            os.replace(self._tmp(name), os.path.join(self.directory, name))
+        return index
+
+    def abort(self):
+        """Drop everything written so far."""
+        self._chunks.close()
+        self._vectors.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def write_snapshot(directory: str, index: faiss.Index, docs: list[Document], vectors: np.ndarray,
+                   extra_meta: Optional[dict] = None):
+    """Write `index` (row i = docs[i] = vectors[i]) and the docs in the compact on-disk format."""
+    writer = SnapshotWriter(directory)
+    writer.add(docs, vectors)
+    writer.close(extra_meta, index=index)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def write_manifest(directory: str, entries: list[tuple[str, str]]):
+    """Row-ordered (id, content hash) pairs, so the next build can tell what changed."""
+    tmp_path = os.path.join(directory, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"chunks": [list(entry) for entry in entries]}, f)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+
+
+def read_manifest(directory: str, docstore: "CompactDocstore") -> list[tuple[str, str]]:
+    """The manifest of a snapshot; rebuilt from the stored texts for snapshots written without one."""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            return [tuple(entry) for entry in json.load(f)["chunks"]]
+    except FileNotFoundError:
+        docs = (docstore.get(i) for i in range(len(docstore)))
+        return [(doc.metadata.get("id"), content_hash(doc.page_content)) for doc in docs]
+
+
+def snapshot_dir(root: str, version: str) -> str:
+    return os.path.join(root, SNAPSHOTS_DIR, version)
+
+
+def resolve(root: str) -> Optional[tuple[str, str]]:
+    """(version, directory) of the snapshot CURRENT points at, or None if there is none.
+
+    A single snapshot written straight into `root` (the layout before versioned
+    snapshots) is still served until populate_database_copy.py republishes it.
+    """
+    try:
+        with open(os.path.join(root, CURRENT_FILE), encoding="utf-8") as f:
+            version = f.read().strip()
+        return version, snapshot_dir(root, version)
+    except FileNotFoundError:
+        pass
+    if not exists(root):
+        return None
+    with open(os.path.join(root, META_FILE), encoding="utf-8") as f:
+        version = json.load(f).get("version") or str(int(os.path.getmtime(os.path.join(root, INDEX_FILE))))
+    return version, root
+
+
+def publish(root: str, version: str, keep: int):
+    """Point CURRENT at snapshots/<version> atomically and prune all but the newest `keep`."""
+    tmp_path = os.path.join(root, CURRENT_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILE))
+
+    # Servers still on an older snapshot keep their open mmaps after the files are unlinked
+    versions = sorted(os.listdir(os.path.join(root, SNAPSHOTS_DIR)), reverse=True)
+    for old in [v for v in versions if v != version][max(keep - 1, 0):]:
+        shutil.rmtree(snapshot_dir(root, old), ignore_errors=True)
@@ -0,0 +1,58 @@
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, TypeVar
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain.schema.document import Document
+
+T = TypeVar("T")
+
+
+def pdf_paths(directory: str) -> list[str]:
+    """Visible PDFs under `directory`, in a stable order so chunk ids and row order repeat."""
+    root = Path(directory)
+    return sorted(str(path) for path in root.glob("**/[!.]*.pdf")
+                  if path.is_file() and not any(part.startswith(".") for part in path.relative_to(root).parts))
+
+
+def _parse_pdf(path: str) -> list[Document]:
+    # Runs in a worker process; pypdf text extraction is pure Python and CPU-bound
+    pages = PyPDFLoader(path).load()
+    for page in pages:
+        page.metadata["source"] = path
+    return pages
+
+
+def iter_pdf_pages(paths: list[str], workers: int, prefetch: int) -> Iterator[list[Document]]:
+    """
+    The pages of each PDF, one file at a time and in `paths` order. Files are
+    parsed by `workers` processes while the caller works on earlier ones; at
+    most `prefetch` files are parsed ahead, which bounds the memory they hold.
+    """
+    queued = iter(paths)
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = deque((path, pool.submit(_parse_pdf, path)) for path, _ in zip(queued, range(max(1, prefetch))))
+        while pending:
+            path, future = pending.popleft()
+            following = next(queued, None)
+            if following is not None:
+                pending.append((following, pool.submit(_parse_pdf, following)))
+            try:
+                pages = future.result()
+            except Exception as e:
+                logging.error(f"❌ Failed to parse {path}: {e}")
+                raise
+            yield pages
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,101 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "of", "in", "on", "at", "to", "for",
+    "and", "or", "what", "who", "whom", "which", "how", "when", "where", "why", "do", "does",
+    "did", "can", "could", "i", "me", "my", "you", "your", "tell", "about", "please", "there",
+    "this", "that", "it", "its", "with", "by", "from", "as", "give", "list", "any",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    # Keep short tokens: department acronyms (EEE, SOP) and course codes matter here
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the docstore, stored as an inverted index.
+
+    Built next to the FAISS index by populate_database_copy.py and keyed by the
+    same docstore ids, so lexical hits can be fetched from the vector store's
+    docstore and fused with vector results.
+    """
+
+    def __init__(self, doc_ids: list[str], doc_lengths: list[int],
+                 postings: dict[str, list[tuple[int, int]]], k1: float = 1.5, b: float = 0.75):
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.postings = postings
+        self.k1 = k1
+        self.b = b
+        self.avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        n = len(doc_ids)
+        self.idf = {
+            term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @classmethod
+    def build(cls, docs: list[tuple[str, str]]) -> "BM25Index":
+        """Index (docstore id, text) pairs."""
+        doc_ids, doc_lengths = [], []
+        postings: dict[str, list[tuple[int, int]]] = {}
+        for i, (doc_id, text) in enumerate(docs):
+            terms = Counter(tokenize(text))
+            doc_ids.append(doc_id)
+            doc_lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                postings.setdefault(term, []).append((i, tf))
+        return cls(doc_ids, doc_lengths, postings)
+
+    def search(self, query: str, k: int) -> list[tuple[str, float]]:
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[i] / self.avg_length)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.doc_ids[i], score) for i, score in best]
+
+    def reference_score(self, query: str) -> float:
+        """Score of an average-length document containing every query term once.
+
+        Terms the corpus has never seen count at the highest idf, so queries that
+        lean on them are not judged lexically confident.
+        """
+        unseen = math.log(1 + (len(self.doc_ids) + 0.5) / 0.5)
+        return sum(self.idf.get(term, unseen) for term in set(tokenize(query)))
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"doc_ids": self.doc_ids, "doc_lengths": self.doc_lengths,
+                       "postings": self.postings, "k1": self.k1, "b": self.b}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        postings = {term: [tuple(p) for p in plist] for term, plist in data["postings"].items()}
+        return cls(data["doc_ids"], data["doc_lengths"], postings, data["k1"], data["b"])
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int) -> list[str]:
+    """Merge several best-first id rankings; ids ranked well by any list rise to the top."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
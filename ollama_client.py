@@ -0,0 +1,85 @@
+import asyncio
+import logging
+
+import httpx
+from langchain_ollama import OllamaEmbeddings, OllamaLLM  # type: ignore
+from ollama import AsyncClient
+
+from config import (
+    OLLAMA_BASE_URL, LLM_MODEL, EMBED_MODEL, OLLAMA_KEEP_ALIVE,
+    OLLAMA_MAX_CONNECTIONS, OLLAMA_KEEP_WARM_INTERVAL,
+)
+
+
+def _client_kwargs() -> dict:
+    # One pool of persistent connections per client instead of a new socket per request
+    return {"limits": httpx.Limits(max_connections=OLLAMA_MAX_CONNECTIONS,
+                                   max_keepalive_connections=OLLAMA_MAX_CONNECTIONS)}
+
+
+class OllamaPool:
+    """
+    Process-wide Ollama clients for generation and embeddings.
+
+    Both LangChain wrappers are built once and reused by every request, so their
+    HTTP connections stay open; per-request callbacks go through the `config`
+    argument of invoke/astream instead of a new client. Answers stream through
+    the raw `client`, which also returns the token context of each generation
+    for session continuation. `keep_warm` preloads and
+    pins both models with keep_alive and re-pings them periodically; `ready`
+    stays False until both models answered. A request that cannot reach Ollama
+    calls `unreachable`, which clears `ready` and re-checks straight away.
+    """
+
+    def __init__(self):
+        self.llm = OllamaLLM(model=LLM_MODEL, base_url=OLLAMA_BASE_URL,
+                             keep_alive=OLLAMA_KEEP_ALIVE, client_kwargs=_client_kwargs())
+        self.embeddings = OllamaEmbeddings(model=EMBED_MODEL, base_url=OLLAMA_BASE_URL,
+                                           keep_alive=OLLAMA_KEEP_ALIVE, client_kwargs=_client_kwargs())
+        self.client = AsyncClient(host=OLLAMA_BASE_URL, **_client_kwargs())
+        self.ready = False
+        self._recheck = asyncio.Event()
+
+    def unreachable(self, error: Exception):
+        """A request could not connect: stop reporting ready until a ping gets through again."""
+        if self.ready:
+            logging.warning(f"⚠️ Ollama unreachable, marking not ready: {error}")
+        self.ready = False
+        self._recheck.set()
+
+    async def warm(self) -> bool:
+        """Load (or keep loaded) both models; returns whether they are hot."""
+        try:
+            # An empty prompt loads the model without generating anything
+            await self.client.generate(model=LLM_MODEL, prompt="", keep_alive=OLLAMA_KEEP_ALIVE)
+            await self.client.embed(model=EMBED_MODEL, input="warm up", keep_alive=OLLAMA_KEEP_ALIVE)
+        except Exception as e:
+            if self.ready:
+                logging.warning(f"⚠️ Ollama keep-warm ping failed: {e}")
+            self.ready = False
+            return False
+        if not self.ready:
+            logging.info(f"🔥 Ollama models {LLM_MODEL} and {EMBED_MODEL} are loaded and pinned")
+        self.ready = True
+        return True
+
+    async def keep_warm(self):
+        """Run for the lifetime of the server: warm at startup, then ping periodically."""
+        while True:
+            self._recheck.clear()
+            ok = await self.warm()
+            # Retry quickly until the models come up, then settle into the ping interval
+            try:
+                await asyncio.wait_for(self._recheck.wait(), OLLAMA_KEEP_WARM_INTERVAL if ok else 5)
+            except asyncio.TimeoutError:
+                pass
+
+
+_pool = None
+
+
+def get_ollama_pool() -> OllamaPool:
+    global _pool
+    if _pool is None:
+        _pool = OllamaPool()
+    return _pool
@@ -1,17 +1,29 @@
 import argparse
+import itertools
 import os
 import shutil
-import re
+import time
+import uuid
+from collections import Counter
+from typing import Iterator, Optional
+import numpy as np
 import pandas as pd
 import logging
+import faiss
 
-from langchain_community.document_loaders import PyPDFDirectoryLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.schema.document import Document
 from langchain_community.vectorstores import FAISS
 
 from get_embedding_function_copy import get_embedding_function
-from config import DATA_PATH, CSV_PATH, FAISS_DIR, PDF_CHUNK_SIZE, PDF_CHUNK_OVERLAP, LOGS_DIR
+from faculty_index import normalize_name
+from lexical_index import BM25Index
+from embedding_store import EmbeddingStore, embed_batched, embed_stream
+import index_store
+import ingest
+from config import DATA_PATH, CSV_PATH, FAISS_DIR, INDEX_SNAPSHOTS_KEEP, FAISS_INDEX_TYPE, PDF_CHUNK_SIZE, PDF_CHUNK_OVERLAP, LOGS_DIR, EMBED_MODEL
+from config import EMBED_STORE_PATH, INDEX_EMBED_BATCH_SIZE, INDEX_EMBED_CONCURRENCY, INDEX_EMBED_RETRIES
+from config import PDF_PARSE_WORKERS, PDF_PARSE_PREFETCH
 
 # Configure logging
 logging.basicConfig(
@@ -27,12 +39,77 @@ def clear_database():
         logging.info("✨ Cleared FAISS index directory.")
 
 
-def load_and_chunk_pdfs() -> list[Document]:
-    loader = PyPDFDirectoryLoader(DATA_PATH)
-    docs = loader.load()
+def write_lexical_index(directory: str):
+    # Keyed by docstore id (the row number) so the query side can fetch hits from db.docstore.
+    # Texts are read back from the written snapshot one at a time.
+    docstore = index_store.CompactDocstore(directory)
+    path = os.path.join(directory, index_store.BM25_FILE)
+    BM25Index.build((str(i), docstore.get(i).page_content) for i in range(len(docstore))).save(path)
+    logging.info(f"🔤 BM25 index written for {len(docstore)} documents.")
+
+
+def embed_documents(embed_fn, docs: list[Document], store: Optional[EmbeddingStore] = None) -> np.ndarray:
+    return embed_batched(embed_fn, [d.page_content for d in docs], INDEX_EMBED_BATCH_SIZE,
+                         INDEX_EMBED_CONCURRENCY, INDEX_EMBED_RETRIES, store)
+
+
+def load_existing(embed_fn) -> tuple[list[tuple[str, str]], np.ndarray, dict]:
+    """Manifest (id, content hash), vectors and metadata of the current index, in FAISS row order."""
+    current = index_store.resolve(FAISS_DIR)
+    if current:
+        snapshot = index_store.IndexSnapshot(current[1])
+        manifest = index_store.read_manifest(current[1], snapshot.docstore)
+        return manifest, index_store.load_vectors(current[1], mmap=True), snapshot.meta
+    if not all(os.path.exists(os.path.join(FAISS_DIR, name)) for name in (index_store.INDEX_FILE, "index.pkl")):
+        # Nothing published yet, e.g. only what an interrupted or empty run left behind
+        return [], None, {}
+
+    # Index saved by LangChain's FAISS.save_local (pickled docstore): convert it once.
+    # This is our own file, so unpickling it here is fine; the server never does.
+    logging.info("🔁 Converting LangChain FAISS index to the compact format…")
+    db = FAISS.load_local(FAISS_DIR, embeddings=embed_fn, allow_dangerous_deserialization=True)
+    docs = [db.docstore.search(db.index_to_docstore_id[i]) for i in range(db.index.ntotal)]
+    manifest = [(d.metadata.get("id"), index_store.content_hash(d.page_content)) for d in docs]
+    return manifest, db.index.reconstruct_n(0, db.index.ntotal), {}
+
+
+def remove_unversioned_files():
+    # Left in FAISS_DIR by older layouts; CURRENT now decides what is served
+    for name in (index_store.INDEX_FILE, index_store.CHUNKS_FILE, index_store.OFFSETS_FILE,
+                 index_store.META_FILE, index_store.BM25_FILE, "index.pkl", "VERSION"):
+        path = os.path.join(FAISS_DIR, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def publish_snapshot(writer: index_store.SnapshotWriter, version: str, embed_model: str,
+                     manifest: list[tuple[str, str]]):
+    started = time.perf_counter()
+    index = writer.close({"version": version, "embed_model": embed_model, "index_config": FAISS_INDEX_TYPE},
+                         index_type=FAISS_INDEX_TYPE)
+    logging.info(f"🧮 Built {type(faiss.downcast_index(index)).__name__} over {writer.count} vectors "
+                 f"in {time.perf_counter() - started:.1f}s")
+    write_lexical_index(writer.directory)
+    index_store.write_manifest(writer.directory, manifest)
+    # Running servers pick the new snapshot up from CURRENT without a restart
+    index_store.publish(FAISS_DIR, version, INDEX_SNAPSHOTS_KEEP)
+    remove_unversioned_files()
+    logging.info(f"🏷️ Published index version {version}")
+
+
+def iter_pdf_chunks(directory: str = DATA_PATH) -> Iterator[Document]:
+    """Chunks of every PDF, one file at a time; files are parsed in worker processes."""
+    paths = ingest.pdf_paths(directory)
+    logging.info(f"📄 Parsing {len(paths)} PDFs with {PDF_PARSE_WORKERS} workers…")
+    for pages in ingest.iter_pdf_pages(paths, PDF_PARSE_WORKERS, PDF_PARSE_PREFETCH):
+        yield from chunk_documents(pages)
+
+
+def chunk_documents(docs: list[Document], chunk_size: int = PDF_CHUNK_SIZE,
+                    chunk_overlap: int = PDF_CHUNK_OVERLAP) -> list[Document]:
     splitter = RecursiveCharacterTextSplitter(
-        chunk_size=PDF_CHUNK_SIZE,
-        chunk_overlap=PDF_CHUNK_OVERLAP,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
         length_function=len,
         is_separator_regex=False,
     )
@@ -58,10 +135,23 @@ def assign_pdf_chunk_ids(chunks: list[Document]) -> list[Document]:
     return chunks
 
 
-def load_csv_documents() -> list[Document]:
-    df = pd.read_csv(CSV_PATH)
+def csv_row_id(row: pd.Series) -> str:
+    """Stable across edits and reordering: the email, else the name and department."""
+    email = row.get("email")
+    if pd.notna(email) and str(email).strip():
+        return f"faculty:{str(email).strip().lower()}"
+    name, department = row.get("name"), row.get("department")
+    key = " ".join(str(name).lower().split()) if pd.notna(name) else ""
+    if pd.notna(department):
+        key += "|" + " ".join(str(department).lower().split())
+    return f"faculty:{key}"
+
+
+def load_csv_documents(path: str = CSV_PATH) -> list[Document]:
+    df = pd.read_csv(path)
     docs = []
-    for i, row in df.iterrows():
+    seen = Counter()
+    for _, row in df.iterrows():
         parts = []
         for col, val in row.items():
             if pd.notna(val):
@@ -73,25 +163,19 @@ def load_csv_documents() -> list[Document]:
             parts.extend(normalize_name(row["name"]))
 
         text = "\n".join(parts)
+        row_id = csv_row_id(row)
+        seen[row_id] += 1
+        if seen[row_id] > 1:
+            row_id = f"{row_id}#{seen[row_id]}"
         docs.append(
             Document(
                 page_content=text,
-                metadata={"id": f"csv_row_{i}", "source": "faculty_data.csv"},
+                metadata={"id": row_id, "source": "faculty_data.csv"},
             )
         )
     return docs
 
 
-def normalize_name(name: str) -> list[str]:
-    name_field = str(name).strip()
-    no_hon = re.sub(r"(?i)\b(mr|ms|mrs|dr)\.\s*", "", name_field).strip()
-    normalized_parts = [f"name_normalized: {no_hon.lower()}"]
-    for p in re.split(r"\s+|\.", no_hon):
-        if len(p) > 1:
-            normalized_parts.append(f"name_part: {p.lower()}")
-    return normalized_parts
-
-
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--reset", action="store_true", help="Reset the FAISS database.")
@@ -101,33 +185,76 @@ def main():
         clear_database()
 
     embed_fn = get_embedding_function()
+    embed_model = getattr(embed_fn, "model", EMBED_MODEL)
 
-    # 1) Load & chunk PDFs
-    pdf_chunks = load_and_chunk_pdfs()
-    logging.info(f"📄 PDF chunks prepared: {len(pdf_chunks)}")
-
-    # 2) Initialize FAISS from PDFs (or load existing)
+    # 1) The current index: chunks whose text is unchanged keep their vectors
+    old_manifest, old_vectors, meta = [], None, {}
+    rebuild = True
     if os.path.isdir(FAISS_DIR):
         logging.info("📂 Loading existing FAISS index…")
-        db = FAISS.load_local(FAISS_DIR, embeddings=embed_fn, allow_dangerous_deserialization=True)
-    else:
-        logging.info("📂 Building new FAISS index from PDFs…")
-        db = FAISS.from_documents(pdf_chunks, embedding=embed_fn)
-        db.save_local(FAISS_DIR)
-        logging.info(f"✅ Saved FAISS index with {len(pdf_chunks)} PDF chunks.")
-
-    # 3) Load CSV docs and add only new ones
-    csv_docs = load_csv_documents()
-    existing_ids = set(db.docstore._dict.keys())
-    new_docs = [d for d in csv_docs if d.metadata["id"] not in existing_ids]
-
-    if new_docs:
-        logging.info(f"📋 Adding {len(new_docs)} new CSV rows…")
-        db.add_documents(new_docs, ids=[d.metadata["id"] for d in new_docs])
-        db.save_local(FAISS_DIR)
-        logging.info("✅ Successfully indexed CSV data.")
-    else:
-        logging.info("✅ No new CSV rows to add.")
+        old_manifest, old_vectors, meta = load_existing(embed_fn)
+        # Indexes from older layouts, or built as another index type, are rebuilt and republished
+        rebuild = (not os.path.exists(os.path.join(FAISS_DIR, index_store.CURRENT_FILE))
+                   or meta.get("index_config", "flat") != FAISS_INDEX_TYPE)
+    old_rows = {h: row for row, (_, h) in enumerate(old_manifest)}
+    if old_rows and meta.get("embed_model", EMBED_MODEL) != embed_model:
+        logging.info(f"🔁 Embedding model changed to {embed_model}, re-embedding everything…")
+        old_rows = {}
+        rebuild = True
+    reused = 0
+
+    def known(texts: list[str]) -> dict[str, np.ndarray]:
+        nonlocal reused
+        found = {}
+        for text in texts:
+            row = old_rows.get(index_store.content_hash(text))
+            if row is not None:
+                found[text] = old_vectors[row]
+        reused += len(found)
+        return found
+
+    # 2) Stream: PDFs parsed in worker processes -> chunks -> fixed-size batches,
+    # embedded while the next files are parsed -> appended to the new snapshot
+    version = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    # Text embedded by any earlier build (even one thrown away by --reset) is not sent again
+    store = EmbeddingStore(EMBED_STORE_PATH, embed_model) if EMBED_STORE_PATH else None
+    writer = None
+    manifest = []
+    embedded = 0
+    try:
+        writer = index_store.SnapshotWriter(index_store.snapshot_dir(FAISS_DIR, version))
+        documents = itertools.chain(iter_pdf_chunks(), load_csv_documents())
+        batches = ingest.batched(documents, INDEX_EMBED_BATCH_SIZE)
+        stream = embed_stream(embed_fn, batches, lambda d: d.page_content,
+                              INDEX_EMBED_CONCURRENCY, INDEX_EMBED_RETRIES, store, known)
+        for n, (docs, vectors, sent) in enumerate(stream, 1):
+            writer.add(docs, vectors)
+            manifest.extend((d.metadata.get("id"), index_store.content_hash(d.page_content)) for d in docs)
+            embedded += sent
+            if n % 20 == 0:
+                logging.info(f"🧠 {len(manifest)} chunks written, {embedded} embedded so far…")
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    finally:
+        if store is not None:
+            store.close()
+
+    if not manifest:
+        writer.abort()
+        logging.warning("⚠️ Nothing to index.")
+        return
+    if not rebuild and [tuple(entry) for entry in old_manifest] == manifest:
+        writer.abort()
+        logging.info(f"✅ Index is up to date ({len(manifest)} documents), nothing to publish.")
+        return
+
+    removed = len(set(old_rows) - {h for _, h in manifest})
+    logging.info(f"🧾 {reused} chunks unchanged, {len(manifest) - reused} new or edited "
+                 f"({embedded} embedded, the rest from the cache), {removed} removed.")
+    publish_snapshot(writer, version, embed_model, manifest)
+    logging.info(f"✅ Saved FAISS index with {len(manifest)} documents.")
 
 
 if __name__ == "__main__":
@@ -1,37 +1,61 @@
+import asyncio
 import datetime
-import queue
-import threading
 import logging
-from langchain_community.vectorstores import FAISS
-from langchain.prompts import ChatPromptTemplate
-from langchain_ollama import OllamaLLM  # type: ignore
-from langchain.callbacks.base import BaseCallbackHandler
-from langchain.memory import ConversationBufferMemory
-from langchain.schema import HumanMessage, AIMessage
+import re
+import time
+import httpx
+import numpy as np
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, NamedTuple, Optional, Sequence
+from langchain.schema import Document
 from get_embedding_function_copy import get_embedding_function
+from ollama_client import get_ollama_pool
+from query_utils import normalize_query, fingerprint, estimate_tokens
+from context_packer import pack_context
+from singleflight import SingleFlight
+from answer_cache import AnswerCache
+from embedding_cache import CachedQueryEmbeddings
+from session_memory import SessionMemoryStore
+from faculty_index import FacultyIndex
+from lexical_index import reciprocal_rank_fusion
+from index_manager import IndexManager, IndexState
+from metrics import Counter, Histogram, TOKEN_BUCKETS, RATE_BUCKETS
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config import FAISS_DIR, SPECIAL_KEYWORDS, LOGS_DIR
+from config import (
+    FAISS_DIR, CSV_PATH, SPECIAL_KEYWORDS, LOGS_DIR,
+    ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_MAX_BYTES, ANSWER_CACHE_TTL, ANSWER_CACHE_SIMILARITY,
+    QUERY_EMBED_CACHE_SIZE, QUERY_EMBED_CACHE_PATH,
+    MEMORY_MAX_SESSIONS, MEMORY_IDLE_TTL, MEMORY_MAX_BYTES, MEMORY_HISTORY_TOKENS,
+    MEMORY_SUMMARY_ENABLED, MEMORY_SUMMARY_TOKENS,
+    PDF_CHUNK_OVERLAP, RETRIEVAL_K, PROMPT_TOKEN_BUDGET, CONTEXT_MIN_TOKENS,
+    RETRIEVAL_MODE, RRF_K, LEXICAL_ONLY_CONFIDENCE, LEXICAL_ONLY_MARGIN, LEXICAL_MIN_SCORE, EMBED_BATCH_SIZE,
+    LLM_MODEL, OLLAMA_KEEP_ALIVE, LLM_CONTINUATION,
+)
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     filename=os.path.join(LOGS_DIR, 'quer.log'),
-    filemode='w'
+    filemode='a'
 )
 
 # --- CONFIG ---
-PROMPT_TEMPLATE = """
+# The prompt goes from most to least stable: fixed instructions, then the session's
+# earlier turns (append-only), then this turn's context and question. Consecutive
+# prompts of a session share everything before the new turn, so Ollama reuses
+# that prefix from its KV cache instead of prefilling it again.
+PROMPT_PREAMBLE = """
 You are Etheg, a helpful assistant for NNRG college. Your primary goal is to provide accurate and concise answers based on the provided context.
 When asked for the 'head' or 'HOD' of a department, you must prioritize searching for and using documents that explicitly contain the title "Head of Department" or "HOD".
 If the context does not contain the answer to the question, state that you do not have enough information to answer. Do not make up information.
 Use the conversation history to understand the user's intent and follow-up questions.
+"""
 
-Conversation history:
-{history}
-
+# One turn; on its own it is the whole prompt when continuing a session's token context
+TURN_TEMPLATE = """
 Context:
 {context}
 
@@ -40,118 +64,397 @@ Question: {question}
 Answer:
 """
 
-# --- In‐memory store of ConversationBufferMemory per session ---
-_memory_store: dict[str, ConversationBufferMemory] = {}
-
-def get_memory(session_id: str) -> ConversationBufferMemory:
-    if session_id not in _memory_store:
-        _memory_store[session_id] = ConversationBufferMemory(memory_key="chat_history")
-    return _memory_store[session_id]
-
-# --- Streaming Callback Handler ---
-class StreamingQueueCallbackHandler(BaseCallbackHandler):
-    def __init__(self, q: queue.Queue, memory: ConversationBufferMemory, user_query: str):
-        self.q = q
-        self.memory = memory
-        self.buffer = ""
-        # record the user’s turn
-        self.memory.chat_memory.add_user_message(user_query)
-
-    def on_llm_new_token(self, token: str, **kwargs):
-        self.q.put(token)
-        self.buffer += token
-
-    def on_llm_end(self, response: any, **kwargs):
-        # record the assistant’s turn
-        self.memory.chat_memory.add_ai_message(self.buffer)
-        self.q.put(None)
-
-    def on_llm_error(self, error: BaseException, **kwargs):
-        logging.error(f"LLM Error: {error}")
-        self.q.put(None)
-
-# --- Load FAISS index once ---
+PROMPT_TEMPLATE = PROMPT_PREAMBLE + """
+Conversation history:
+{history}
+""" + TURN_TEMPLATE
+
+SUMMARY_TEMPLATE = """
+Summarize the following conversation between a student and Etheg, the NNRG college assistant, in at most {limit} words.
+Keep the names, departments and facts the student asked about.
+
+{summary}
+{conversation}
+
+Summary:
+"""
+
+# --- Hot-path metrics, exposed by app.py on /metrics ---
+GENERATIONS = Counter("nnrg_generations_total", "LLM generations by outcome", ("outcome",))
+ANSWERS = Counter("nnrg_answers_total", "Questions by how they were answered", ("source",))
+RETRIEVAL_SECONDS = Histogram("nnrg_retrieval_seconds", "Whole context retrieval per question")
+EMBED_SECONDS = Histogram("nnrg_embed_seconds", "Query embedding, including the embedding cache")
+SEARCH_SECONDS = Histogram("nnrg_search_seconds", "Index search by kind", labels=("kind",))
+PROMPT_TOKENS = Histogram("nnrg_prompt_tokens", "Estimated prompt size sent to the LLM", TOKEN_BUCKETS)
+PROMPTS = Counter("nnrg_prompts_total", "LLM prompts by layout: full history or continued context", ("layout",))
+PREFILL_TOKENS = Histogram("nnrg_prefill_tokens", "Prompt tokens Ollama reports it evaluated", TOKEN_BUCKETS)
+GENERATION_SECONDS = Histogram("nnrg_generation_seconds", "Ollama generation from request to last token")
+GENERATION_FIRST_TOKEN_SECONDS = Histogram("nnrg_generation_first_token_seconds",
+                                           "Ollama prefill: request to first token")
+TOKENS_PER_SECOND = Histogram("nnrg_generation_tokens_per_second", "Decode speed after the first token",
+                              RATE_BUCKETS)
+
+# --- Identical concurrent questions share one generation ---
+_inflight = SingleFlight()
+
+# --- Finished answers to first-turn questions, per index version ---
+answer_cache = AnswerCache(ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_MAX_BYTES,
+                           ANSWER_CACHE_TTL, ANSWER_CACHE_SIMILARITY)
+
+async def _summarize(session_id: str, summary: str, conversation: str) -> str:
+    return await get_ollama_pool().llm.ainvoke(SUMMARY_TEMPLATE.format(
+        limit=MEMORY_SUMMARY_TOKENS * 3 // 4, summary=summary, conversation=conversation
+    ))
+
+# --- Bounded conversation memory per session ---
+session_memory = SessionMemoryStore(
+    MEMORY_MAX_SESSIONS, MEMORY_IDLE_TTL, MEMORY_MAX_BYTES, MEMORY_HISTORY_TOKENS,
+    summarizer=_summarize if MEMORY_SUMMARY_ENABLED else None,
+    summary_tokens=MEMORY_SUMMARY_TOKENS,
+)
+
+def _build_faculty_index() -> Optional[FacultyIndex]:
+    try:
+        index = FacultyIndex.from_csv(CSV_PATH)
+        logging.info(f"✅ Faculty index built: {len(index.rows)} rows, "
+                     f"{len(index.by_department)} departments.")
+        return index
+    except Exception as e:
+        logging.error(f"❌ Failed building faculty index: {e}")
+        return None
+
+def _on_index_swap(state: IndexState):
+    # Runs in the reload thread: only rebind globals here, never touch structures
+    # the event loop mutates. The answer cache drops entries of the old version
+    # itself the first time it sees the new one.
+    global faculty_index
+    # populate_database_copy.py reads the same CSV, keep the fast path in step with it
+    rebuilt = _build_faculty_index()
+    if rebuilt is None and faculty_index is not None:
+        logging.warning("⚠️ Keeping the previous faculty index for the new snapshot")
+        return
+    faculty_index = rebuilt
+
+# --- Structured faculty table for direct answers ---
+faculty_index = _build_faculty_index()
+
+# --- Load the published FAISS snapshot; newer ones are swapped in by app.py ---
 logging.info("🔧 Loading embedding function and FAISS index...")
+# Student queries are short and repetitive; keep their embeddings in-process
+embedding_function = CachedQueryEmbeddings(
+    get_embedding_function(), QUERY_EMBED_CACHE_SIZE, QUERY_EMBED_CACHE_PATH
+)
+index_manager = IndexManager(FAISS_DIR)
 try:
-    embedding_function = get_embedding_function()
-    db = FAISS.load_local(
-        FAISS_DIR,
-        embeddings=embedding_function,
-        allow_dangerous_deserialization=True
-    )
-    csv_ids = [doc_id for doc_id, doc in db.docstore._dict.items() if doc.metadata.get("source") == "faculty_data.csv"]
-    logging.info(f"✅ FAISS index loaded. {len(csv_ids)} CSV rows available.")
+    # Memory-mapped index + lazily read docstore: no unpickling, pages shared between workers
+    index_manager.reload()
+    loaded = index_manager.current
+    csv_rows = loaded.db.meta.get("sources", {}).get("faculty_data.csv", 0)
+    logging.info(f"✅ FAISS index {loaded.version} loaded. {len(loaded.db)} chunks, {csv_rows} CSV rows available.")
 except Exception as e:
     logging.error(f"❌ Failed loading FAISS: {e}")
-    db = None
-    csv_ids = []
+index_manager.on_swap = _on_index_swap
 
 def is_special_query(query: str) -> bool:
     return any(k in query.lower() for k in SPECIAL_KEYWORDS)
 
-# --- Main entrypoint with context support ---
-def stream_query_agent(query_text: str, token_queue: queue.Queue, session_id: str):
+def _replay(answer: str) -> list[str]:
+    """Split a ready-made answer into word tokens so it streams like a generation."""
+    return re.findall(r"\s+|\S+\s*", answer)
+
+async def _generate(prompt: str, context: Optional[Sequence[int]] = None,
+                    on_context: Optional[Callable[[list[int]], None]] = None) -> AsyncIterator[str]:
     """
-    Launches a background thread that streams LLM tokens into token_queue,
-    while preserving conversation history in memory.
+    Stream a single Ollama generation, recording how long it took and how it ended.
+    With `context` the prompt continues an earlier generation's token context;
+    `on_context` receives the context this one returns.
+    """
+    client = get_ollama_pool().client
+    emitted = 0
+    chunks = 0
+    started = time.perf_counter()
+    first_token_at = None
+    final = None
+    try:
+        stream = await client.generate(model=LLM_MODEL, prompt=prompt, context=context, stream=True,
+                                       keep_alive=OLLAMA_KEEP_ALIVE)
+        # aclosing() makes sure the Ollama HTTP stream is closed (which stops the
+        # generation server-side) as soon as our consumer goes away
+        async with aclosing(stream) as parts:
+            async for part in parts:
+                if part.done:
+                    final = part
+                token = part.response
+                if not token:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    GENERATION_FIRST_TOKEN_SECONDS.observe(first_token_at - started)
+                emitted += len(token)
+                chunks += 1
+                yield token
+    except (asyncio.CancelledError, GeneratorExit):
+        GENERATIONS.inc("cancelled")
+        logging.info(f"🛑 Generation cancelled after {emitted} chars, nobody is listening")
+        raise
+    except Exception as e:
+        GENERATIONS.inc("failed")
+        if isinstance(e, (ConnectionError, httpx.TransportError)):
+            get_ollama_pool().unreachable(e)
+        raise
+    finished = time.perf_counter()
+    GENERATIONS.inc("completed")
+    GENERATION_SECONDS.observe(finished - started)
+    # Ollama streams one token per chunk
+    if first_token_at is not None and chunks > 1 and finished > first_token_at:
+        TOKENS_PER_SECOND.observe((chunks - 1) / (finished - first_token_at))
+    if final is not None:
+        if final.prompt_eval_count:
+            PREFILL_TOKENS.observe(final.prompt_eval_count)
+        if on_context and final.context:
+            on_context(list(final.context))
+
+class Turn(NamedTuple):
+    query_text: str
+    session_id: str
+    prior_history: str
+    # Ready-made answer and where it came from; None means the LLM has to answer
+    answer: Optional[str] = None
+    source: str = "llm"
+    # What the generation needs: the snapshot searched, its retrieval, the token
+    # context to continue from and the answer-cache key to store the result under
+    index: Optional[IndexState] = None
+    retrieval: Optional["Retrieval"] = None
+    continued: Optional[Sequence[int]] = None
+    cache_key: Optional[tuple[str, str]] = None
+
+    @property
+    def needs_llm(self) -> bool:
+        return self.answer is None
+
+async def prepare_turn(query_text: str, session_id: str) -> Turn:
+    """
+    Everything about a question that can be settled without the LLM: faculty
+    lookups, retrieval and the answer cache. app.py calls this before asking
+    the scheduler for a slot, so answers that need no generation never wait
+    in, or get turned away by, the LLM queue.
     """
     logging.info(f"🔍 Session {session_id} Received query: {query_text}")
-    memory = get_memory(session_id)
-    handler = StreamingQueueCallbackHandler(token_queue, memory, query_text)
-
-    # Build the history string
-    history_pieces = []
-    for msg in memory.chat_memory.messages:
-        if isinstance(msg, HumanMessage):
-            history_pieces.append(f"User: {msg.content}")
-        elif isinstance(msg, AIMessage):
-            history_pieces.append(f"Assistant: {msg.content}")
-    history = "\n".join(history_pieces)
-
-    # Determine RAG context
-    ctx = ""
-    if db:
+    prior_history = session_memory.history(session_id)
+
+    # Faculty lookups (HOD of a department, someone's email or designation) come
+    # straight from the table in milliseconds
+    direct = faculty_index.answer(query_text) if faculty_index else None
+    if direct:
+        return Turn(query_text, session_id, prior_history, direct, "faculty")
+
+    # One snapshot for the whole request, even if a reload swaps in a newer one meanwhile
+    index = index_manager.current
+
+    # Continue from the session's token context while the new turn still fits after it
+    continued = None
+    if LLM_CONTINUATION and index:
+        continued = session_memory.continuation(session_id, index.version)
+    if continued is not None:
+        context_budget = PROMPT_TOKEN_BUDGET - len(continued) - estimate_tokens(TURN_TEMPLATE + query_text)
+        if context_budget < CONTEXT_MIN_TOKENS:
+            logging.info(f"📏 Session {session_id} context is full, starting over from the history")
+            session_memory.clear_continuation(session_id)
+            continued = None
+    if continued is None:
+        # Context gets whatever the prompt budget leaves after the template, history and question
+        context_budget = max(
+            CONTEXT_MIN_TOKENS,
+            PROMPT_TOKEN_BUDGET - estimate_tokens(PROMPT_TEMPLATE + prior_history + query_text),
+        )
+
+    # Determine RAG context (embedding + FAISS are blocking, keep them off the event loop)
+    retrieval = None
+    if index:
         # Always search the full index for context
-        ctx = _search_full(query_text)
+        retrieval = await asyncio.to_thread(_search_full, query_text, context_budget, index=index)
+
+    # A first-turn answer depends only on the question and the retrieved chunks
+    cache_key = None
+    if retrieval and retrieval.doc_ids and not prior_history:
+        cache_key = (normalize_query(query_text), fingerprint(*retrieval.doc_ids))
+        cached = answer_cache.get(*cache_key, index.version, retrieval.query_embedding)
+        if cached is not None:
+            return Turn(query_text, session_id, prior_history, cached, "cache")
+    return Turn(query_text, session_id, prior_history, index=index, retrieval=retrieval,
+                continued=continued, cache_key=cache_key)
+
+# --- Main entrypoint with context support ---
+async def stream_query_agent(query_text: str, session_id: str) -> AsyncIterator[str]:
+    """prepare_turn() and answer_turn() in one go, for callers without a scheduler."""
+    async with aclosing(answer_turn(await prepare_turn(query_text, session_id))) as tokens:
+        async for token in tokens:
+            yield token
 
-    # Format prompt with history + context + question
-    prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE).format(
-        history=history,
-        context=ctx,
-        question=query_text
-    )
+def _record_turn(session_id: str, query_text: str, answer: str):
+    # Both messages or neither: a failed or abandoned generation leaves the history as it was,
+    # instead of a question without an answer that the next prompt would carry along
+    session_memory.add_user_message(session_id, query_text)
+    session_memory.add_ai_message(session_id, answer)
 
-    # Load the streaming LLM and invoke
+async def answer_turn(turn: Turn) -> AsyncIterator[str]:
+    """
+    Async generator that yields LLM tokens as Ollama produces them,
+    while preserving conversation history in memory.
+    """
+    query_text, session_id, prior_history = turn.query_text, turn.session_id, turn.prior_history
+    index, retrieval, continued, cache_key = turn.index, turn.retrieval, turn.continued, turn.cache_key
+    if not turn.needs_llm:
+        logging.info(f"⚡ Session {session_id} answered without the LLM ({turn.source})")
+        ANSWERS.inc(turn.source)
+        for token in _replay(turn.answer):
+            yield token
+        # The model never saw this turn, so its token context no longer matches the history
+        session_memory.clear_continuation(session_id)
+        _record_turn(session_id, query_text, turn.answer)
+        return
+
+    ctx = retrieval.context if retrieval else ""
+
+    def remember(tokens: list[int]):
+        session_memory.set_continuation(session_id, index.version, tokens)
+
+    on_context = remember if LLM_CONTINUATION and index else None
+    if continued is not None:
+        # Only the new turn; the history is already in the token context
+        prompt = TURN_TEMPLATE.format(context=ctx, question=query_text)
+        PROMPTS.inc("continued")
+        tokens_source = _generate(prompt, list(continued), on_context)
+    else:
+        prompt = PROMPT_TEMPLATE.format(history=prior_history, context=ctx, question=query_text)
+        PROMPTS.inc("full")
+        # Sessions asking the same question over the same context and history would get
+        # the same prompt, so they share one generation. Only the session that started
+        # it keeps the returned token context; the others stay on full prompts.
+        flight_key = fingerprint(normalize_query(query_text), ctx, prior_history)
+        tokens_source = _inflight.stream(flight_key, lambda: _generate(prompt, on_context=on_context))
+    PROMPT_TOKENS.observe(estimate_tokens(prompt))
+    ANSWERS.inc("llm")
+
+    buffer = ""
     try:
-        llm = OllamaLLM(model="nnrgbot", streaming=True, callbacks=[handler])
+        async with aclosing(tokens_source) as tokens:
+            async for token in tokens:
+                buffer += token
+                yield token
     except Exception as e:
-        logging.error(f"❌ Ollama load error: {e}")
-        token_queue.put(f"Error: could not load LLM: {e}")
-        token_queue.put(None)
+        logging.error(f"LLM Error: {e}")
+        yield f"Error: could not generate an answer: {e}"
         return
+    _record_turn(session_id, query_text, buffer)
+    if cache_key:
+        answer_cache.put(*cache_key, index.version, buffer, retrieval.query_embedding)
+
+def _lexical_search(index: IndexState, query_text: str) -> list[tuple[Document, float]]:
+    if not index.lexical or RETRIEVAL_MODE != "hybrid":
+        return []
+    hits = []
+    started = time.perf_counter()
+    results = index.lexical.search(query_text, k=RETRIEVAL_K)
+    SEARCH_SECONDS.observe(time.perf_counter() - started, "lexical")
+    for doc_id, score in results:
+        doc = index.db.docstore.search(doc_id)
+        if isinstance(doc, Document):
+            hits.append((doc, score))
+    return hits
+
+def _lexically_confident(index: IndexState, query_text: str, hits: list[tuple[Document, float]]) -> bool:
+    """True when the best BM25 hit matches most of the query and clearly beats the runner-up."""
+    if LEXICAL_ONLY_CONFIDENCE is None or not hits:
+        return False
+    top = hits[0][1]
+    runner_up = hits[1][1] if len(hits) > 1 else 0.0
+    return (top >= LEXICAL_ONLY_CONFIDENCE * index.lexical.reference_score(query_text)
+            and top >= LEXICAL_ONLY_MARGIN * runner_up)
+
+def _fuse(vector_docs: list[Document], lexical_docs: list[Document]) -> list[Document]:
+    """Reciprocal-rank fusion of the two result lists, keyed by chunk id."""
+    by_key = {}
+    rankings = []
+    for docs in (vector_docs, lexical_docs):
+        ranking = []
+        for doc in docs:
+            key = doc.metadata.get("id") or doc.page_content
+            by_key.setdefault(key, doc)
+            ranking.append(key)
+        rankings.append(ranking)
+    return [by_key[key] for key in reciprocal_rank_fusion(rankings, RRF_K)[:RETRIEVAL_K]]
 
-    threading.Thread(target=lambda: llm.invoke(prompt), daemon=True).start()
+class Retrieval(NamedTuple):
+    context: str
+    doc_ids: list[str]
+    query_embedding: Optional[list[float]]
 
-def _search_full(query_text: str, score_threshold: float = 1.2) -> str:
+def _search_full(query_text: str, budget_tokens: int = PROMPT_TOKEN_BUDGET,
+                 score_threshold: float = 1.2, index: Optional[IndexState] = None) -> Retrieval:
     """
     Searches the entire FAISS index and filters results by a relevance score threshold.
-    Lower scores are better (more relevant).
+    Lower scores are better (more relevant). The surviving chunks are packed into
+    at most `budget_tokens` of context. Searches `index`, or the current snapshot.
     """
-    if not db:
-        return "Vector database is not available."
+    index = index or index_manager.current
+    if not index:
+        return Retrieval("Vector database is not available.", [], None)
+    started = time.perf_counter()
     try:
-        # Retrieve documents with their relevance scores
-        results_with_scores = db.similarity_search_with_score(query_text, k=5)
+        lexical = _lexical_search(index, query_text)
+        query_embedding = None
+        if _lexically_confident(index, query_text, lexical):
+            # Exact names, acronyms and codes: BM25 alone is enough, skip the embedder
+            logging.info(f"⚡ Lexical-only retrieval for '{query_text}'.")
+            filtered_results = [doc for doc, _ in lexical]
+        else:
+            # Embed once ourselves so the vector can be reused by the answer cache
+            embed_started = time.perf_counter()
+            query_embedding = embedding_function.embed_query(query_text)
+            search_started = time.perf_counter()
+            EMBED_SECONDS.observe(search_started - embed_started)
+            # Retrieve documents with their relevance scores
+            results_with_scores = index.db.similarity_search_with_score_by_vector(query_embedding, k=RETRIEVAL_K)
+            SEARCH_SECONDS.observe(time.perf_counter() - search_started, "vector")
 
-        # Filter results based on the score threshold
-        filtered_results = [doc for doc, score in results_with_scores if score < score_threshold]
+            # Filter results based on the score threshold
+            filtered_results = [doc for doc, score in results_with_scores if score < score_threshold]
+            # BM25 hits need a floor too, or one shared word would always bring in context
+            floor = LEXICAL_MIN_SCORE * index.lexical.reference_score(query_text) if lexical else 0.0
+            lexical_results = [doc for doc, score in lexical if score >= floor]
+            if lexical_results:
+                filtered_results = _fuse(filtered_results, lexical_results)
 
         if not filtered_results:
             logging.info(f"ℹ️ No results for '{query_text}' met the score threshold of {score_threshold}.")
-            return "No relevant context found."
+            return Retrieval("No relevant context found.", [], query_embedding)
 
         logging.info(f"ℹ️ Found {len(filtered_results)} relevant documents for '{query_text}'.")
-        return "\n\n---\n\n".join(doc.page_content for doc in filtered_results)
+        context, doc_ids = pack_context(filtered_results, budget_tokens, PDF_CHUNK_OVERLAP)
+        return Retrieval(context, doc_ids, query_embedding)
     except Exception as e:
         logging.warning(f"⚠️ Full search error: {e}")
-        return "Error during context retrieval."
+        return Retrieval("Error during context retrieval.", [], None)
+    finally:
+        RETRIEVAL_SECONDS.observe(time.perf_counter() - started)
+
+def retrieve_batch(queries: list[str], k: int = RETRIEVAL_K, score_threshold: Optional[float] = None,
+                   index: Optional[IndexState] = None) -> list[list[tuple[Document, float]]]:
+    """
+    Vector search for many queries at once, for offline jobs (FAQ contexts,
+    threshold tuning, log replays). Queries are embedded in batches of
+    EMBED_BATCH_SIZE and searched with one FAISS call over the stacked matrix.
+    Returns, per query, its chunks best first with their L2 distances; with
+    `score_threshold` only chunks scoring below it are kept.
+    """
+    index = index or index_manager.current
+    if not index:
+        raise RuntimeError("Vector database is not available.")
+    if not queries:
+        return []
+    embeddings = embedding_function.embed_queries(queries, EMBED_BATCH_SIZE)
+    results = index.db.search_by_vectors(embeddings, k)
+    if score_threshold is not None:
+        results = [[(doc, score) for doc, score in hits if score < score_threshold] for hits in results]
+    return results
@@ -0,0 +1,22 @@
+import hashlib
+import re
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivially different
+    spellings of the same question compare equal."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def fingerprint(*parts: str) -> str:
+    """Stable hash of several strings, used as a cache / coalescing key."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return (len(text) + 3) // 4
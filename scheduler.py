@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class SchedulerBusy(Exception):
+    """Raised when a generation request cannot be admitted."""
+
+
+class Ticket:
+    """A session's place in line for one LLM generation."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.state = "queued"  # queued -> active -> done
+        self._granted = asyncio.Event()
+
+    @property
+    def granted(self) -> bool:
+        return self.state == "active"
+
+
+class LLMScheduler:
+    """
+    Bounded admission in front of the Ollama model.
+
+    At most `max_concurrency` generations run at once. Everyone else waits in a
+    bounded queue that is served round-robin per session, so a user who sends
+    many messages only ever occupies one turn of the rotation.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, max_queued_per_session: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queued_per_session = max_queued_per_session
+        self.active = 0
+        self.queued = 0
+        self._waiting: "OrderedDict[str, deque[Ticket]]" = OrderedDict()
+
+    def submit(self, session_id: str) -> Ticket:
+        """Admit a request or raise SchedulerBusy; never blocks."""
+        ticket = Ticket(session_id)
+        if self.active < self.max_concurrency and not self.queued:
+            self._grant(ticket)
+            return ticket
+
+        if self.queued >= self.max_queue:
+            raise SchedulerBusy(f"wait queue full ({self.queued} waiting)")
+        pending = self._waiting.get(session_id)
+        if pending and len(pending) >= self.max_queued_per_session:
+            raise SchedulerBusy(f"session already has {len(pending)} queued requests")
+
+        self._waiting.setdefault(session_id, deque()).append(ticket)
+        self.queued += 1
+        logging.info(f"⏳ Queued session {session_id} at position {self.position(ticket)}")
+        return ticket
+
+    async def run(self, session_id: str, fn: Callable[..., Awaitable[T]], *args) -> T:
+        """Await `fn(*args)` once `session_id` is given a slot; raises SchedulerBusy like submit()."""
+        ticket = self.submit(session_id)
+        try:
+            await ticket._granted.wait()
+            return await fn(*args)
+        finally:
+            self.release(ticket)
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based position in the round-robin dispatch order, 0 once granted."""
+        if ticket.state != "queued":
+            return 0
+        queues = list(self._waiting.values())
+        pos = 0
+        for rnd in range(max((len(q) for q in queues), default=0)):
+            for q in queues:
+                if rnd < len(q):
+                    pos += 1
+                    if q[rnd] is ticket:
+                        return pos
+        return 0
+
+    async def wait(self, ticket: Ticket, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for the ticket to be granted."""
+        try:
+            await asyncio.wait_for(ticket._granted.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return ticket.granted
+
+    def release(self, ticket: Ticket):
+        """Give back a running slot or leave the queue. Safe to call twice."""
+        if ticket.state == "active":
+            self.active -= 1
+        elif ticket.state == "queued":
+            pending = self._waiting.get(ticket.session_id)
+            if pending and ticket in pending:
+                pending.remove(ticket)
+                self.queued -= 1
+                if not pending:
+                    del self._waiting[ticket.session_id]
+        ticket.state = "done"
+        self._dispatch()
+
+    def _grant(self, ticket: Ticket):
+        ticket.state = "active"
+        self.active += 1
+        ticket._granted.set()
+
+    def _dispatch(self):
+        while self.active < self.max_concurrency and self._waiting:
+            session_id, pending = next(iter(self._waiting.items()))
+            ticket = pending.popleft()
+            self.queued -= 1
+            if pending:
+                # Served once this round; go to the back of the rotation
+                self._waiting.move_to_end(session_id)
+            else:
+                del self._waiting[session_id]
+            self._grant(ticket)
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import time
+from array import array
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Sequence
+
+from langchain.memory import ConversationBufferMemory
+from langchain.schema import AIMessage, BaseMessage, HumanMessage
+
+from query_utils import estimate_tokens
+
+# (session id, previous summary, dropped conversation) -> new summary
+Summarizer = Callable[[str, str, str], Awaitable[str]]
+
+
+def render_messages(messages: list[BaseMessage]) -> str:
+    history_pieces = []
+    for msg in messages:
+        if isinstance(msg, HumanMessage):
+            history_pieces.append(f"User: {msg.content}")
+        elif isinstance(msg, AIMessage):
+            history_pieces.append(f"Assistant: {msg.content}")
+    return "\n".join(history_pieces)
+
+
+class _Session:
+    __slots__ = ("memory", "summary", "last_used", "nbytes", "continuation", "unsummarized", "summarizing")
+
+    def __init__(self):
+        self.memory = ConversationBufferMemory(memory_key="chat_history")
+        self.summary = ""
+        self.last_used = time.monotonic()
+        self.nbytes = 0
+        # (index version, Ollama token context after the last generated answer)
+        self.continuation: Optional[tuple[str, array]] = None
+        # Dropped messages waiting for the summarizer, which runs one batch at a time
+        self.unsummarized: list[BaseMessage] = []
+        self.summarizing = False
+
+    @property
+    def messages(self) -> list[BaseMessage]:
+        return self.memory.chat_memory.messages
+
+
+class SessionMemoryStore:
+    """
+    Per-session conversation memory with bounded size.
+
+    Sessions are evicted least-recently-used first once there are more than
+    `max_sessions` of them or they hold more than `max_bytes` in total, and any
+    session idle for `idle_ttl` seconds is dropped. Each session keeps only as
+    many recent messages as fit in `history_tokens`; when a summarizer is given,
+    the messages that fall out of the window are folded into a rolling summary.
+
+    A session can also hold the token context Ollama returned for its last
+    answer, so the next turn continues from it instead of re-sending the
+    history. It counts towards `max_bytes` and goes away with the session.
+    """
+
+    def __init__(self, max_sessions: int, idle_ttl: float, max_bytes: int, history_tokens: int,
+                 summarizer: Optional[Summarizer] = None, summary_tokens: int = 200):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.history_tokens = history_tokens
+        self.summarizer = summarizer
+        self.summary_tokens = summary_tokens
+        self.nbytes = 0
+        self.evicted = 0
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        # The event loop only keeps weak references to tasks
+        self._summaries: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def history(self, session_id: str) -> str:
+        """Rendered summary plus recent turns, ready for the prompt."""
+        session = self._touch(session_id)
+        history = render_messages(session.messages)
+        if session.summary:
+            history = f"Summary of the earlier conversation: {session.summary}\n{history}".rstrip()
+        return history
+
+    def add_user_message(self, session_id: str, text: str):
+        self._add(session_id, HumanMessage(content=text))
+
+    def add_ai_message(self, session_id: str, text: str):
+        self._add(session_id, AIMessage(content=text))
+
+    def continuation(self, session_id: str, version: str) -> Optional[array]:
+        """Token context to continue from, or None if there is none for this index version."""
+        session = self._sessions.get(session_id)
+        if session is None or session.continuation is None:
+            return None
+        if session.continuation[0] != version:
+            # Earlier answers were grounded in another index; start over from the full prompt
+            self.clear_continuation(session_id)
+            return None
+        return session.continuation[1]
+
+    def set_continuation(self, session_id: str, version: str, tokens: Sequence[int]):
+        session = self._sessions.get(session_id)
+        if session is None:
+            return  # evicted while generating
+        self.clear_continuation(session_id)
+        session.continuation = (version, array("i", tokens))
+        self._account(session, len(tokens) * session.continuation[1].itemsize)
+        self._evict()
+
+    def clear_continuation(self, session_id: str):
+        session = self._sessions.get(session_id)
+        if session is None or session.continuation is None:
+            return
+        self._account(session, -len(session.continuation[1]) * session.continuation[1].itemsize)
+        session.continuation = None
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._sessions), "bytes": self.nbytes, "evicted": self.evicted,
+                "continuations": sum(s.continuation is not None for s in self._sessions.values())}
+
+    def _touch(self, session_id: str) -> _Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        self._evict()
+        return session
+
+    def _add(self, session_id: str, message: BaseMessage):
+        session = self._touch(session_id)
+        session.memory.chat_memory.add_message(message)
+        self._account(session, len(message.content.encode("utf-8")))
+        self._trim(session_id, session)
+        self._evict()
+
+    def _trim(self, session_id: str, session: _Session):
+        messages = session.messages
+        tokens = sum(estimate_tokens(m.content) for m in messages)
+        if tokens <= self.history_tokens:
+            return
+        # Trim well below the budget so the kept history (the prompt prefix) stays
+        # unchanged for several turns instead of shifting by one message every turn
+        target = self.history_tokens * 3 // 4
+        dropped = []
+        while len(messages) > 1 and tokens > target:
+            msg = messages.pop(0)
+            tokens -= estimate_tokens(msg.content)
+            self._account(session, -len(msg.content.encode("utf-8")))
+            dropped.append(msg)
+        if dropped and self.summarizer:
+            session.unsummarized.extend(dropped)
+            if session.summarizing:
+                return  # the running summary picks these up when it finishes
+            session.summarizing = True
+            task = asyncio.get_running_loop().create_task(self._summarize(session_id, session))
+            self._summaries.add(task)
+            task.add_done_callback(self._summaries.discard)
+
+    async def _summarize(self, session_id: str, session: _Session):
+        # Each batch builds on the previous summary, so overlapping runs would overwrite each other
+        try:
+            while session.unsummarized and self._sessions.get(session_id) is session:
+                dropped, session.unsummarized = session.unsummarized, []
+                try:
+                    summary = (await self.summarizer(session_id, session.summary, render_messages(dropped))).strip()
+                except Exception as e:
+                    logging.warning(f"⚠️ Session {session_id} summary failed: {e}")
+                    continue
+                if self._sessions.get(session_id) is not session:
+                    return  # evicted while we were summarizing
+                # Hard cap in case the model ignores the length instruction
+                summary = summary[: self.summary_tokens * 4]
+                self._account(session, len(summary.encode("utf-8")) - len(session.summary.encode("utf-8")))
+                session.summary = summary
+        finally:
+            session.summarizing = False
+
+    def _account(self, session: _Session, delta: int):
+        session.nbytes += delta
+        self.nbytes += delta
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            over = len(self._sessions) > self.max_sessions or self.nbytes > self.max_bytes
+            idle = now - session.last_used > self.idle_ttl
+            # Never evict the most recent session, it is the one being served
+            if not (over or idle) or len(self._sessions) == 1 and not idle:
+                break
+            del self._sessions[session_id]
+            self.nbytes -= session.nbytes
+            self.evicted += 1
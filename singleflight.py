@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Optional
+
+
+class _Flight:
+    def __init__(self):
+        self.tokens: list[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    def notify(self):
+        self._wake.set()
+        self._wake = asyncio.Event()
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight generations.
+
+    The first caller for a key starts the generation in a background task; callers
+    arriving while it runs attach to it, get the tokens emitted so far replayed,
+    and then follow the live output. The generation is cancelled only once every
+    subscriber has gone away; a cancelled or failed flight is never handed out
+    again, the next caller for its key starts a new one.
+    """
+
+    def __init__(self):
+        self._flights: dict[str, _Flight] = {}
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        flight = self._flights.get(key)
+        if flight is None or flight.done:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(key, flight, factory))
+        else:
+            self.coalesced += 1
+            logging.info(f"🔗 Attached to in-flight generation {key[:12]} ({flight.subscribers} already listening)")
+
+        flight.subscribers += 1
+        try:
+            sent = 0
+            while True:
+                wake = flight._wake
+                while sent < len(flight.tokens):
+                    sent += 1
+                    yield flight.tokens[sent - 1]
+                if flight.done:
+                    break
+                await wake.wait()
+            if flight.error:
+                raise flight.error
+        finally:
+            flight.subscribers -= 1
+            if not flight.subscribers and not flight.done:
+                # Unlist it now: the task only cleans up once the cancellation is delivered
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    async def _run(self, key: str, flight: _Flight, factory: Callable[[], AsyncIterator[str]]):
+        try:
+            async with aclosing(factory()) as tokens:
+                async for token in tokens:
+                    flight.tokens.append(token)
+                    flight.notify()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            self._forget(key, flight)
+            flight.notify()
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -76,11 +76,27 @@ class Chatbox {
         console.log(`Connecting to /stream?message=${encodedMessage}`);
 
         let firstTokenReceived = false;
+        let reconnects = 0;
 
         this.eventSource.onopen = () => {
             console.log("EventSource connection opened.");
         };
 
+        this.eventSource.addEventListener('queued', (event) => {
+            // Server is at capacity; show our place in line until tokens arrive
+            if (!firstTokenReceived && this.currentBotMessageElement) {
+                this.currentBotMessageElement.textContent = `Waiting for a free slot (position ${event.data})...`;
+            }
+        });
+
+        this.eventSource.addEventListener('done', () => {
+            // Answer complete; close so the browser doesn't reconnect
+            this.eventSource.close();
+            console.log("EventSource closed after completion.");
+            this.eventSource = null;
+            this.currentBotMessageElement = null;
+        });
+
         this.eventSource.onmessage = (event) => {
              if (!firstTokenReceived && this.currentBotMessageElement) {
                  this.currentBotMessageElement.textContent = '';
@@ -97,6 +113,14 @@ class Chatbox {
         this.eventSource.onerror = (err) => {
             console.error("EventSource failed:", err);
 
+            // Connection dropped mid-answer: the browser reconnects with Last-Event-ID
+            // and the server replays what we missed from the same generation
+            if (this.eventSource && this.eventSource.readyState === EventSource.CONNECTING && reconnects < 5) {
+                reconnects++;
+                console.log(`EventSource reconnecting (attempt ${reconnects})...`);
+                return;
+            }
+
              if (this.currentBotMessageElement && !firstTokenReceived) {
                  this.currentBotMessageElement.textContent = "Sorry, could not get a response.";
              } else if (this.currentBotMessageElement) {
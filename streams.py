@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from uuid import uuid4
+
+# (seq, event name or None for a plain token, data)
+Frame = tuple[int, Optional[str], str]
+
+
+class ResumableStream:
+    """
+    One generation's output, decoupled from the HTTP connection reading it.
+
+    Frames are numbered and the most recent ones are kept in a ring buffer so a
+    reconnecting EventSource can replay what it missed from its Last-Event-ID.
+    """
+
+    def __init__(self, session_id: str, replay_size: int):
+        self.stream_id = uuid4().hex
+        self.session_id = session_id
+        self.frames: deque[Frame] = deque(maxlen=replay_size)
+        self.seq = 0
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._reaper: Optional[asyncio.TimerHandle] = None
+        self._wake = asyncio.Event()
+
+    def publish(self, event: Optional[str], data: str):
+        self.seq += 1
+        self.frames.append((self.seq, event, data))
+        self._notify()
+
+    def close(self):
+        self.done = True
+        self.finished_at = time.monotonic()
+        self._notify()
+
+    def _notify(self):
+        self._wake.set()
+        self._wake = asyncio.Event()
+
+    async def follow(self, after: int) -> AsyncIterator[Frame]:
+        """Yield every frame after `after`, then keep following until the stream ends."""
+        if self.frames and self.frames[0][0] > after + 1:
+            logging.warning(f"⚠️ Stream {self.stream_id}: frames {after + 1}..{self.frames[0][0] - 1} "
+                            f"fell out of the replay buffer")
+        while True:
+            wake = self._wake
+            for frame in list(self.frames):
+                if frame[0] > after:
+                    after = frame[0]
+                    yield frame
+            if self.done and after >= self.seq:
+                return
+            await wake.wait()
+
+
+class StreamRegistry:
+    """
+    Live and recently finished streams, addressable by their SSE event IDs.
+
+    A session has at most one generation running: starting a new stream cancels
+    the session's previous one if it is still going, since its client has moved
+    on to the next message.
+    """
+
+    def __init__(self, replay_size: int, resume_grace: float, retain: float):
+        self.replay_size = replay_size
+        self.resume_grace = resume_grace
+        self.retain = retain
+        self._streams: dict[str, ResumableStream] = {}
+        self._latest: dict[str, ResumableStream] = {}
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def start(self, session_id: str,
+              producer: Callable[[ResumableStream], Awaitable[None]]) -> ResumableStream:
+        """Run `producer` in the background, publishing into a new stream."""
+        self._purge()
+        previous = self._latest.get(session_id)
+        if previous and not previous.done and previous.task:
+            logging.info(f"🛑 Stream {previous.stream_id} superseded by a new message, cancelling generation")
+            previous.task.cancel()
+        stream = ResumableStream(session_id, self.replay_size)
+        stream.task = asyncio.create_task(self._run(stream, producer))
+        self._streams[stream.stream_id] = stream
+        self._latest[session_id] = stream
+        return stream
+
+    def resume(self, last_event_id: Optional[str], session_id: str) -> Optional[tuple[ResumableStream, int]]:
+        """Map a Last-Event-ID header back to its stream and sequence number."""
+        if not last_event_id:
+            return None
+        stream_id, _, seq = last_event_id.partition(":")
+        stream = self._streams.get(stream_id)
+        if not stream or stream.session_id != session_id or not seq.isdigit():
+            return None
+        return stream, int(seq)
+
+    async def subscribe(self, stream: ResumableStream, after: int) -> AsyncIterator[Frame]:
+        stream.subscribers += 1
+        if stream._reaper:
+            stream._reaper.cancel()
+            stream._reaper = None
+        try:
+            async with aclosing(stream.follow(after)) as frames:
+                async for frame in frames:
+                    yield frame
+        finally:
+            stream.subscribers -= 1
+            if not stream.subscribers and not stream.done:
+                # Give the client a moment to reconnect before dropping the generation
+                loop = asyncio.get_running_loop()
+                stream._reaper = loop.call_later(self.resume_grace, self._reap, stream)
+
+    def _reap(self, stream: ResumableStream):
+        stream._reaper = None
+        if not stream.subscribers and not stream.done and stream.task:
+            logging.info(f"🛑 Stream {stream.stream_id} abandoned, cancelling generation")
+            stream.task.cancel()
+
+    async def _run(self, stream: ResumableStream, producer: Callable[[ResumableStream], Awaitable[None]]):
+        try:
+            await producer(stream)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logging.error(f"❌ Stream {stream.stream_id} failed: {e}")
+        finally:
+            stream.close()
+
+    def _purge(self):
+        now = time.monotonic()
+        for stream_id, stream in list(self._streams.items()):
+            if stream.done and now - stream.finished_at > self.retain:
+                del self._streams[stream_id]
+                if self._latest.get(stream.session_id) is stream:
+                    del self._latest[stream.session_id]